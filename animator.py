@@ -0,0 +1,463 @@
+"""Демо рендер і професійна генерація без Streamlit.
+
+``Animator`` тримає все, що потрібно задачам оживлення: клієнти
+провайдерів, статистику здоровʼя, лімітер, кеші рендеру і генерацій,
+сховище відео та метрики. Секрети передаються звичайним словником (у
+Streamlit — ``st.secrets``, у CLI — змінні середовища), помилки
+провайдерів піднімаються як ``ProviderError``, а прогрес повідомляється
+через ``job.update`` — модуль нічого не показує сам, тож його імпортують
+і інтерфейс ``app.py``, і пакетний ``cli.py``.
+
+    animator = Animator(secrets={"REPLICATE_TOKEN": "r8_..."})
+    job = JobQueue().submit("cli", "photo.jpg", functools.partial(
+        animator.run_demo_job, image_bytes=data, prompt="волосся хитається"), trace=Trace("demo"))
+"""
+
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from demo_engine import (ENGINE_VERSION, PREVIEW_MAX_EDGE, PreparedImage, default_render_workers, detect_effects,
+                         fit_image, open_scaled, render_animation)
+from generation_cache import MISS, GenerationCache, generation_key
+from prediction_waiter import WEBHOOK_POLL_INTERVAL, WebhookReceiver, wait_for_prediction
+from provider_client import build_clients
+from provider_dispatch import ProviderError, dispatch
+from provider_health import ProviderRouter
+from rate_limit import RateLimiter
+from render_cache import PreparedImageCache, RenderCache, cache_key
+from tracing import MetricsRegistry, maybe_stage
+from upload_payload import UploadPayload
+from video_store import VideoStore, VideoStoreError
+
+# Робочі API для справжнього оживлення
+REPLICATE_LTX_API = "https://api.replicate.com/v1/predictions"
+REPLICATE_FILES_API = "https://api.replicate.com/v1/files"
+SEGMIND_LTX_API = "https://api.segmind.com/v1/ltx-video"
+FAL_API = "https://fal.run/fal-ai/ltx-video"
+MODAL_API = "https://lightricks-ltx-video-distilled.modal.run"
+
+REPLICATE_LTX_VERSION = "ac9693cdb61a5d8b185f00db93b7b27aca7c845ce7d04b78aefbeaf6e7f1d4c6"  # LTX-Video 0.9.7 distilled
+DEMO_SEED = 42  # seed демо анімації за замовчуванням
+REPLICATE_TIMEOUT = 300  # 5 хвилин максимум на генерацію
+SEGMIND_TIMEOUT = 300
+DEFAULT_HEDGE_DELAY = 20  # секунд до запуску наступного провайдера
+PROVIDER_SECRETS = {  # провайдер -> секрет з ключем
+    "replicate_ltx": "REPLICATE_TOKEN",
+    "segmind_direct": "SEGMIND_TOKEN",
+    "fal_direct": "FAL_KEY",
+}
+SECRET_NAMES = (*PROVIDER_SECRETS.values(), "REPLICATE_WEBHOOK_URL", "REPLICATE_WEBHOOK_PORT",
+                "REPLICATE_WEBHOOK_SECRET")
+
+
+def env_secrets(environ=os.environ):
+    """Секрети зі змінних середовища з тими самими назвами, що й у Secrets"""
+    return {name: environ[name] for name in SECRET_NAMES if environ.get(name)}
+
+
+class Animator:
+    """Спільні ресурси й функції задач оживлення; один екземпляр на процес"""
+
+    def __init__(self, secrets=None, metrics=None, render_workers=None, rate_limiter=None,
+                 render_cache=None, prepared_images=None, generation_cache=None, video_store=None,
+                 job_workers=1, replicate_api=None):
+        self.secrets = dict(secrets or {})
+        # Ендпоінт генерацій Replicate; бенчмарк підставляє локальний фейковий сервер
+        self.replicate_api = replicate_api or REPLICATE_LTX_API
+        self.metrics = metrics or MetricsRegistry()
+        # Без явного значення ядра діляться між job_workers одночасними задачами
+        self.render_workers = render_workers or default_render_workers(job_workers)
+        self.clients = build_clients(self.secrets)
+        self.router = ProviderRouter()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.render_cache = render_cache or RenderCache()
+        self.prepared_images = prepared_images or PreparedImageCache()
+        self.generation_cache = generation_cache or GenerationCache()
+        self.video_store = video_store or VideoStore(self.clients["cdn"])
+        self.webhook_receiver = None
+        # Локальний приймач вебхуків Replicate, якщо задано REPLICATE_WEBHOOK_URL;
+        # без секрету підпису вебхуки можна підробити, тож такий запуск відхиляється
+        if self.secrets.get("REPLICATE_WEBHOOK_URL"):
+            if not self.secrets.get("REPLICATE_WEBHOOK_SECRET"):
+                raise ValueError("REPLICATE_WEBHOOK_URL задано без REPLICATE_WEBHOOK_SECRET")
+            self.webhook_receiver = WebhookReceiver(
+                port=int(self.secrets.get("REPLICATE_WEBHOOK_PORT", 8765)),
+                secret=self.secrets.get("REPLICATE_WEBHOOK_SECRET"),
+            )
+
+    def providers(self):
+        """Провайдери, для яких задано ключі"""
+        return [name for name, secret in PROVIDER_SECRETS.items() if self.secrets.get(secret)]
+
+    # Провайдери
+
+    def upload_replicate_file(self, jpeg):
+        """Двійкове завантаження зображення через Replicate Files API"""
+        response = self.clients["replicate"].post(
+            REPLICATE_FILES_API, files={"content": ("image.jpg", jpeg, "image/jpeg")}
+        )
+        if response.status_code != 201:
+            raise ProviderError(f"Replicate Files API помилка: {response.status_code} - {response.text}")
+        return response.json()["urls"]["get"]
+
+    def generate_video_replicate_ltx(self, upload, prompt, duration=5):
+        """Генерація через Replicate LTX-Video (найкраща якість)"""
+        try:
+            # Зображення вже зменшене до роздільності моделі та закодоване;
+            # великі файли йдуть двійково замість base64
+            if upload.prefers_binary:
+                image_ref = upload.upload("replicate", self.upload_replicate_file)
+            else:
+                image_ref = upload.data_uri
+
+            payload = {
+                "version": REPLICATE_LTX_VERSION,
+                "input": {
+                    "image": image_ref,
+                    "prompt": prompt,
+                    "num_frames": int(duration * 8),  # 8 FPS для швидкості
+                    "width": upload.width,
+                    "height": upload.height,
+                    "num_inference_steps": 8,  # Distilled model потребує менше кроків
+                    "guidance_scale": 2.5
+                }
+            }
+
+            # Якщо налаштовано вебхук, Replicate сам повідомить про завершення
+            webhook_url = self.secrets.get("REPLICATE_WEBHOOK_URL")
+            if webhook_url:
+                payload["webhook"] = webhook_url
+                payload["webhook_events_filter"] = ["completed"]
+
+            response = self.clients["replicate"].post(self.replicate_api, json=payload)
+
+            if response.status_code == 201:
+                prediction = response.json()
+                return prediction["id"], "replicate_ltx"
+            else:
+                raise ProviderError(f"Replicate API помилка: {response.status_code} - {response.text}")
+
+        except ProviderError:
+            raise
+        except Exception as e:
+            raise ProviderError(f"Помилка Replicate LTX: {e}") from e
+
+    def generate_video_segmind_ltx(self, upload, prompt):
+        """Генерація через Segmind LTX-Video API"""
+        try:
+            payload = {
+                "image": upload.data_uri,
+                "prompt": prompt,
+                "num_frames": 25,
+                "fps": 8,
+                "seed": -1,
+                "guidance_scale": 3.0,
+                "num_inference_steps": 8
+            }
+
+            # Segmind генерує синхронно, тож читання відповіді триває довго
+            response = self.clients["segmind"].post(
+                SEGMIND_LTX_API, json=payload, timeout=(3.05, SEGMIND_TIMEOUT)
+            )
+
+            if response.status_code == 200:
+                result = response.json()
+                return result.get("video_url"), "segmind_direct"
+            else:
+                return None, None
+
+        except Exception as e:
+            return None, None
+
+    def generate_video_fal_ltx(self, upload, prompt):
+        """Генерація через FAL LTX-Video"""
+        try:
+            import fal_client
+
+            # Завантажуємо зображення на FAL двійково, один раз на задачу
+            image_url = upload.upload("fal", lambda jpeg: fal_client.upload(jpeg, "image/jpeg"))
+
+            handle = fal_client.submit(
+                "fal-ai/ltx-video",
+                arguments={
+                    "image_url": image_url,
+                    "prompt": prompt,
+                    "num_frames": 25,
+                    "fps": 8,
+                    "seed": -1,
+                    "guidance_scale": 3.0,
+                    "num_inference_steps": 8
+                },
+            )
+            result = handle.get()
+
+            return result.get("video").get("url"), "fal_direct"
+
+        except Exception as e:
+            return None, None
+
+    def check_replicate_status(self, prediction_id):
+        """Перевірка статусу Replicate генерації"""
+        try:
+            response = self.clients["replicate"].get(f"{self.replicate_api}/{prediction_id}")
+
+            if response.status_code == 200:
+                return response.json()
+            return None
+
+        except Exception as e:
+            return None
+
+    def cancel_replicate(self, prediction_id):
+        """Скасування Replicate генерації, результат якої вже не потрібен"""
+        try:
+            self.clients["replicate"].post(f"{self.replicate_api}/{prediction_id}/cancel")
+        except Exception:
+            pass
+
+    def run_replicate(self, upload, prompt, duration, cancel, trace=None):
+        """Повний цикл Replicate: створення генерації та очікування результату"""
+        submit_start = time.monotonic()
+        with maybe_stage(trace, "replicate_submit", payload_bytes=len(upload.jpeg)):
+            task_id, _ = self.generate_video_replicate_ltx(upload, prompt, duration)
+        self.router.record_submit("replicate_ltx", time.monotonic() - submit_start)
+        receiver = self.webhook_receiver
+        polls = 0
+
+        def fetch_status():
+            nonlocal polls
+            polls += 1
+            if cancel.is_set():
+                self.cancel_replicate(task_id)
+                return {"status": "canceled"}
+            return self.check_replicate_status(task_id)
+
+        # Адаптивне опитування; з вебхуком — чекання на подію і рідке опитування
+        if receiver:
+            wait = lambda seconds: receiver.wait(task_id, seconds)
+            min_interval = WEBHOOK_POLL_INTERVAL
+        else:
+            wait = lambda seconds: cancel.wait(seconds) and None
+            min_interval = 0.0
+        with maybe_stage(trace, "replicate_wait", webhook=bool(receiver)) as span:
+            status = wait_for_prediction(fetch_status, timeout=REPLICATE_TIMEOUT, wait=wait,
+                                         min_interval=min_interval)
+            span.update(polls=polls, status=status.get("status") if status else None)
+
+        if status and status.get("status") == "succeeded":
+            return status.get("output")
+        raise ProviderError(f"Replicate: {status.get('status') if status else 'немає відповіді'}")
+
+    def build_provider_runners(self, image, prompt, duration, trace=None, providers=None):
+        """Налаштовані провайдери в порядку пріоритету для диспетчера"""
+        if providers is None:
+            providers = self.providers()
+        # Зображення готується один раз для всіх провайдерів і повторів
+        with maybe_stage(trace, "prepare_upload") as span:
+            upload = UploadPayload(image)
+            span.update(payload_bytes=len(upload.jpeg), size=f"{upload.width}x{upload.height}")
+        runners = []
+        if "replicate_ltx" in providers:
+            runners.append(("replicate_ltx", lambda cancel: self.run_replicate(
+                upload, prompt, duration, cancel, trace)))
+        if "segmind_direct" in providers:
+            runners.append(("segmind_direct", lambda cancel: traced_provider_call(
+                trace, "segmind_generate", upload, self.generate_video_segmind_ltx, prompt)))
+        if "fal_direct" in providers:
+            runners.append(("fal_direct", lambda cancel: traced_provider_call(
+                trace, "fal_generate", upload, self.generate_video_fal_ltx, prompt)))
+        return runners
+
+    # Демо режим
+
+    def render_demo_tier(self, image, image_bytes, prompt, seed, max_edge, trace=None, stage="demo_render",
+                         output_format="gif"):
+        """Рендер одного рівня роздільності через кеш; повертає (байти, чи_з_кешу)"""
+        variant = f"engine={ENGINE_VERSION}|max_edge={max_edge}" + (
+            f"|format={output_format}" if output_format != "gif" else "")
+        key = cache_key(image_bytes, detect_effects(prompt), seed, variant=variant)
+        image_key = lambda: cache_key(image_bytes, (), None, variant=f"prepared|max_edge={max_edge}")
+        with maybe_stage(trace, stage, max_edge=max_edge, format=output_format) as span:
+            data, from_cache = self.render_cache.get_or_render(
+                key, lambda: self.create_demo_with_ltx_style(image, prompt, seed, max_edge, trace, output_format,
+                                                             image_key=image_key())
+            )
+            span.update(cache_hit=from_cache, payload_bytes=len(data) if data else 0)
+        return data, from_cache
+
+    def create_demo_with_ltx_style(self, image, prompt, seed=DEMO_SEED, max_edge=None, trace=None,
+                                   output_format="gif", image_key=None):
+        """Демо режим, що імітує LTX-Video стиль оживлення
+
+        ``image_key`` (зображення + роздільність) дозволяє взяти вже
+        декодований масив, палітру і розмиття з ``prepared_images``.
+        """
+        # Визначаємо області руху на основі промпту
+        effects = detect_effects(prompt)
+
+        # Рівень роздільності (превʼю або повний рендер з обмеженням розміру)
+        # декодується в масив один раз; палітра GIF рахується наперед
+        with maybe_stage(trace, "demo_palette") as span:
+            prepare = lambda: PreparedImage(fit_image(image, max_edge))
+            if image_key is None:
+                prepared, span["cache_hit"] = prepare(), False
+            else:
+                prepared, span["cache_hit"] = self.prepared_images.get_or_prepare(image_key, prepare)
+            base = prepared.base
+            palette = prepared.palette if output_format == "gif" else None
+
+        # Кадри рендеряться і кодуються паралельно в render_workers потоках (GIF — дельтами
+        # відносно попереднього кадру); явний seed робить тремтіння і мерехтіння
+        # відтворюваними за будь-якої кількості потоків
+        with maybe_stage(trace, f"demo_frames_{output_format}", size=f"{base.shape[1]}x{base.shape[0]}",
+                         workers=self.render_workers) as span:
+            output = render_animation(prepared, effects, output_format, palette,
+                                      rng=np.random.default_rng(seed), workers=self.render_workers)
+            span["payload_bytes"] = len(output)
+        return output
+
+    # Функції задач для JobQueue
+
+    def run_demo_job(self, job, image_bytes, prompt, seed=DEMO_SEED, full_render=True, full_max_edge=2048,
+                     output_format="gif", preview=True):
+        """Фонова задача демо режиму: превʼю, потім повна роздільність
+
+        Без ``preview`` (пакетні запуски) одразу рендериться повна роздільність.
+        """
+        with job.trace.stage("image_open", payload_bytes=len(image_bytes)):
+            image = Image.open(io.BytesIO(image_bytes))
+            preview_source = open_scaled(image_bytes, PREVIEW_MAX_EDGE) if preview else None
+        animation_data = None
+        from_cache = False
+        if preview:
+            job.update(0.1, "створюємо превʼю")
+            animation_data, from_cache = self.render_demo_tier(
+                preview_source, image_bytes, prompt, seed, PREVIEW_MAX_EDGE, job.trace, stage="render_preview",
+                output_format=output_format
+            )
+            if not animation_data:
+                raise RuntimeError("Помилка створення оживлення")
+            tier = f"превʼю до {PREVIEW_MAX_EDGE}px"
+
+        if not preview or (full_render and max(image.size) > PREVIEW_MAX_EDGE):
+            job.update(0.4 if preview else 0.1, "рендеримо повну роздільність", preview=animation_data)
+            full_data, from_cache = self.render_demo_tier(
+                image, image_bytes, prompt, seed, full_max_edge, job.trace, stage="render_full",
+                output_format=output_format
+            )
+            if full_data:
+                animation_data = full_data
+                tier = f"до {full_max_edge}px" if full_max_edge else "оригінал"
+            elif not animation_data:
+                raise RuntimeError("Помилка створення оживлення")
+        return {"mode": "demo", "animation": animation_data, "format": output_format,
+                "from_cache": from_cache, "tier": tier, "prompt": prompt, "seed": seed}
+
+    def generate_professional(self, job, image, prompt, duration, hedge_delay, providers, launched=None):
+        """Хеджована генерація у провайдерів; повертає запис для кешу результатів
+
+        У ``launched`` додаються провайдери, що отримали слот лімітера, тобто
+        фактично запущені (і платні) генерації.
+        """
+        router = self.router
+
+        # Найшвидші та здорові провайдери йдуть першими; провайдери
+        # з розімкненим вимикачем пропускаються
+        runners = router.order(self.build_provider_runners(image, prompt, duration, job.trace, providers))
+        if not runners:
+            raise ProviderError("Усі API тимчасово вимкнені після повторних помилок.")
+
+        # Кожен провайдер стартує лише після слота і токена спільного лімітера;
+        # поки задача чекає, вона бачить свою позицію в черзі до провайдера
+        limiter = self.rate_limiter
+        admitted = launched if launched is not None else set()
+
+        def limited(name, run):
+            def show_position(position, wait):
+                job.update(message=f"черга до {name}: позиція {position}")
+
+            def runner(cancel):
+                with limiter.slot(name, cancel, on_wait=show_position):
+                    admitted.add(name)
+                    return run(cancel)
+            return name, runner
+
+        runners = [limited(name, run) for name, run in runners]
+
+        def show_progress(elapsed, timings):
+            running = ", ".join(name for name, t in timings.items() if t["status"] == "running")
+            job.update(min(elapsed / REPLICATE_TIMEOUT, 1.0),
+                       f"LTX-Video обробка ({running})... {int(elapsed)} секунд", timings=dict(timings))
+
+        # Провайдери запускаються паралельно з затримкою хеджування,
+        # перемагає перший успішний результат
+        with job.trace.stage("dispatch", providers=len(runners)) as span:
+            outcome = dispatch(runners, hedge_delay=hedge_delay, timeout=REPLICATE_TIMEOUT,
+                               on_progress=show_progress)
+            span["provider"] = outcome["provider"]
+        # Провайдери, що так і не дочекались ліміту, нічого не кажуть про своє здоровʼя
+        router.record_dispatch({name: t for name, t in outcome["timings"].items() if name in admitted})
+        job.update(timings=outcome["timings"])
+        if not outcome["video_url"]:
+            raise ProviderError("Всі API недоступні. Спробуйте пізніше або використайте демо режим.")
+        return {"video_url": outcome["video_url"], "provider": outcome["provider"],
+                "timings": outcome["timings"], "created": time.time()}
+
+    def run_professional_job(self, job, image_bytes, prompt, duration=4, quality="Стандарт (8 FPS)",
+                             hedge_delay=DEFAULT_HEDGE_DELAY, providers=None, quota_key=None):
+        """Фонова задача професійного режиму: хеджована генерація у провайдерів
+
+        Ідентичні запити (зображення, промпт, тривалість, версія моделі) не
+        запускають нової платної генерації: беруть результат з кешу або чекають
+        на ту, що вже йде. ``quota_key`` — вікно квоти сесії, яке повернув
+        ``admit``; якщо жоден провайдер так і не запустився (результат з кешу,
+        спільна генерація або помилка до запуску), генерація повертається в
+        це вікно.
+        """
+        launched = set()
+        try:
+            with job.trace.stage("image_open", payload_bytes=len(image_bytes)):
+                image = Image.open(io.BytesIO(image_bytes))
+                image.load()
+
+            key = generation_key(image_bytes, prompt, duration=duration, model=REPLICATE_LTX_VERSION)
+            with job.trace.stage("generation") as span:
+                entry, source = self.generation_cache.get_or_generate(
+                    key,
+                    lambda: self.generate_professional(job, image, prompt, duration, hedge_delay, providers,
+                                                       launched),
+                    on_wait=lambda: job.update(0.05, "чекаємо на таку саму генерацію, що вже триває"),
+                )
+                span["cache"] = source
+        finally:
+            if quota_key is not None and not launched:
+                self.rate_limiter.refund(quota_key)
+        self.metrics.increment("ltx_result_cache", mode="professional", result=source)
+        if source != MISS:
+            job.update(timings=entry["timings"])
+
+        # Відео завантажується з CDN один раз; далі інтерфейс бере локальну копію
+        job.update(0.99, "зберігаємо відео")
+        video_path = None
+        with job.trace.stage("video_store") as span:
+            try:
+                video_path = self.video_store.fetch(entry["video_url"])
+                span["payload_bytes"] = os.path.getsize(video_path)
+            except VideoStoreError as e:
+                span["outcome"] = "error"
+                job.update(store_error=str(e))
+        return {"mode": "professional", "video_url": entry["video_url"], "video_path": video_path,
+                "provider": entry["provider"], "prompt": prompt, "duration": duration,
+                "quality": quality, "cache": source}
+
+
+def traced_provider_call(trace, stage, upload, generate, *args):
+    """Синхронний провайдер як етап трасування; повертає URL відео"""
+    with maybe_stage(trace, stage, payload_bytes=len(upload.jpeg)) as span:
+        video_url = generate(upload, *args)[0]
+        span["outcome"] = "ok" if video_url else "empty"
+    return video_url
@@ -1,261 +1,224 @@
 import streamlit as st
-import requests
+import functools
 import io
+import itertools
+import os
 import time
-import base64
-import json
-from PIL import Image
+import uuid
 
-st.set_page_config(page_title="Справжнє Оживлення Зображень UA", page_icon="🎬")
+RUN_START = time.perf_counter()  # початок запуску сценарію, для звіту про rerun
 
-# Робочі API для справжнього оживлення
-REPLICATE_LTX_API = "https://api.replicate.com/v1/predictions"
-SEGMIND_LTX_API = "https://api.segmind.com/v1/ltx-video"
-FAL_API = "https://fal.run/fal-ai/ltx-video"
-MODAL_API = "https://lightricks-ltx-video-distilled.modal.run"
+# numpy, PIL, requests і модулі рендеру (animator, demo_engine) імпортуються
+# лише на шляху, що їх потребує: сторінка без завантажень їх не чекає
+from generation_cache import COALESCED, HIT
+from job_queue import CANCELED, FAILED, QUEUED, RUNNING, JobQueue, QueueFull
+from rate_limit import AdmissionError, RateLimiter
+from tracing import MetricsRegistry, MetricsServer, Trace, configure_json_logging
 
-def generate_video_replicate_ltx(image, prompt, duration=5):
-    """Генерація через Replicate LTX-Video (найкраща якість)"""
-    try:
-        # Конвертуємо зображення в base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        headers = {
-            "Authorization": f"Bearer {st.secrets.get('REPLICATE_TOKEN', '')}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "version": "ac9693cdb61a5d8b185f00db93b7b27aca7c845ce7d04b78aefbeaf6e7f1d4c6",  # LTX-Video 0.9.7 distilled
-            "input": {
-                "image": f"data:image/jpeg;base64,{img_base64}",
-                "prompt": prompt,
-                "num_frames": int(duration * 8),  # 8 FPS для швидкості
-                "width": min(image.width, 704),
-                "height": min(image.height, 512), 
-                "num_inference_steps": 8,  # Distilled model потребує менше кроків
-                "guidance_scale": 2.5
-            }
-        }
-        
-        response = requests.post(REPLICATE_LTX_API, json=payload, headers=headers)
-        
-        if response.status_code == 201:
-            prediction = response.json()
-            return prediction["id"], "replicate_ltx"
-        else:
-            st.error(f"Replicate API помилка: {response.status_code} - {response.text}")
-            return None, None
-            
-    except Exception as e:
-        st.error(f"Помилка Replicate LTX: {e}")
-        return None, None
+st.set_page_config(page_title="Справжнє Оживлення Зображень UA", page_icon="🎬")
 
-def generate_video_segmind_ltx(image, prompt):
-    """Генерація через Segmind LTX-Video API"""
-    try:
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        headers = {
-            "x-api-key": st.secrets.get('SEGMIND_TOKEN', ''),
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "image": f"data:image/jpeg;base64,{img_base64}",
-            "prompt": prompt,
-            "num_frames": 25,
-            "fps": 8,
-            "seed": -1,
-            "guidance_scale": 3.0,
-            "num_inference_steps": 8
-        }
-        
-        response = requests.post(SEGMIND_LTX_API, json=payload, headers=headers)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("video_url"), "segmind_direct"
-        else:
-            return None, None
-            
-    except Exception as e:
-        return None, None
+METRICS_PORT = int(os.environ.get("LTX_METRICS_PORT", 9108))  # 0 — вимкнути ендпоінт
+JOB_WORKERS = int(os.environ.get("LTX_JOB_WORKERS", 4))  # одночасних задач на процес
+RENDER_WORKERS = int(os.environ.get("LTX_RENDER_WORKERS", 0))  # потоків на рендер; 0 — ядра, поділені між задачами
+MAX_QUEUED_JOBS = int(os.environ.get("LTX_MAX_QUEUED_JOBS", 32))
+MAX_SESSION_JOBS = int(os.environ.get("LTX_MAX_SESSION_JOBS", 8))
+FINISHED_JOBS_MB = int(os.environ.get("LTX_FINISHED_JOBS_MB", 256))  # результати завершених задач у пам'яті
+FINISHED_JOB_TTL = float(os.environ.get("LTX_FINISHED_JOB_TTL", 1800))  # секунд до забування результату
+ANIMATION_FORMATS = {"gif": "GIF", "webp": "WebP", "apng": "APNG"}  # формат -> назва в інтерфейсі
+SESSION_QUOTA = int(os.environ.get("LTX_SESSION_QUOTA", 20))  # професійних генерацій на сесію за годину
+DAILY_BUDGET_USD = float(os.environ.get("LTX_DAILY_BUDGET_USD", 5.0))  # оцінка витрат на добу
+PREPARED_CACHE_MB = int(os.environ.get("LTX_PREPARED_CACHE_MB", 256))  # декодовані зображення для рендеру
+UPLOAD_CACHE_ENTRIES = 32  # скільки завантажень памʼятати між перезапусками
+DISPLAY_MAX_EDGE = 1024  # довша сторона показаного оригіналу
+JOB_REFRESH_SECONDS = 1.0  # як часто оновлювати прогрес активних задач
 
-def generate_video_fal_ltx(image, prompt):
-    """Генерація через FAL LTX-Video"""
-    try:
-        import fal_client
-        
-        # Завантажуємо зображення на FAL
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        
-        result = fal_client.submit(
-            "fal-ai/ltx-video",
-            arguments={
-                "image_url": fal_client.upload(buffered, "image/jpeg"),
-                "prompt": prompt,
-                "num_frames": 25,
-                "fps": 8,
-                "seed": -1,
-                "guidance_scale": 3.0,
-                "num_inference_steps": 8
-            },
-        )
-        
-        return result.get("video").get("url"), "fal_direct"
-        
-    except Exception as e:
-        return None, None
+@st.cache_resource
+def get_metrics():
+    """Метрики етапів для всіх сесій; /metrics у форматі Prometheus на localhost"""
+    configure_json_logging()
+    metrics = MetricsRegistry()
+    if METRICS_PORT:
+        try:
+            MetricsServer(metrics, port=METRICS_PORT)
+        except OSError:
+            pass  # порт зайнятий іншим процесом — метрики лишаються в логах
+    return metrics
 
-def check_replicate_status(prediction_id):
-    """Перевірка статусу Replicate генерації"""
+def read_secrets():
+    """Секрети Streamlit як словник; без файлу секретів — порожній"""
     try:
-        headers = {
-            "Authorization": f"Bearer {st.secrets.get('REPLICATE_TOKEN', '')}",
-        }
-        
-        response = requests.get(f"{REPLICATE_LTX_API}/{prediction_id}", headers=headers)
-        
-        if response.status_code == 200:
-            return response.json()
-        return None
-        
-    except Exception as e:
-        return None
+        return dict(st.secrets)
+    except FileNotFoundError:
+        return {}
 
-def create_demo_with_ltx_style(image, prompt):
-    """Демо режим, що імітує LTX-Video стиль оживлення"""
-    import numpy as np
-    from PIL import ImageEnhance, ImageFilter, ImageDraw
-    
-    frames = []
-    base_frames = 25  # ~3 секунди при 8 FPS
-    
-    # Аналізуємо промпт для типу руху
-    prompt_lower = prompt.lower()
+@st.cache_resource
+def get_animator():
+    """Клієнти, ліміти, кеші і статистика провайдерів, спільні для всіх сесій
+
+    Створюється в потоці сценарію: фонові задачі не бачать ``st.secrets``,
+    тож секрети передаються в ``Animator`` словником.
+    """
+    from animator import Animator
+    from render_cache import PreparedImageCache
     
-    # Визначаємо області руху на основі промпту
-    animate_hair = any(word in prompt_lower for word in ['волосся', 'hair', 'коса', 'локони'])
-    animate_clothes = any(word in prompt_lower for word in ['одяг', 'clothes', 'сукня', 'рубашка', 'куртка'])
-    animate_water = any(word in prompt_lower for word in ['вода', 'water', 'море', 'річка', 'дощ'])
-    animate_fire = any(word in prompt_lower for word in ['вогонь', 'fire', 'полум\'я', 'свічка'])
-    animate_eyes = any(word in prompt_lower for word in ['очі', 'eyes', 'погляд', 'моргання'])
-    animate_smoke = any(word in prompt_lower for word in ['дим', 'smoke', 'пара', 'туман'])
+    return Animator(
+        read_secrets(), metrics=get_metrics(), render_workers=RENDER_WORKERS, job_workers=JOB_WORKERS,
+        rate_limiter=RateLimiter(session_quota=SESSION_QUOTA, daily_budget=DAILY_BUDGET_USD),
+        prepared_images=PreparedImageCache(max_bytes=PREPARED_CACHE_MB * 1024 * 1024),
+    )
+
+@st.cache_resource
+def get_job_queue():
+    """Черга задач для всіх сесій; переживає перезапуски сценарію"""
+    return JobQueue(workers=JOB_WORKERS, max_queued=MAX_QUEUED_JOBS, max_per_session=MAX_SESSION_JOBS,
+                    max_finished_bytes=FINISHED_JOBS_MB * 1024 * 1024, finished_ttl=FINISHED_JOB_TTL)
+
+@st.cache_resource
+def get_run_counter():
+    """Лічильник запусків сценарію в процесі; нульовий — холодний старт"""
+    return itertools.count()
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner=False)
+def describe_upload(data):
+    """Параметри зображення і зменшена копія для показу
+
+    Декодується раз на файл, а не на кожен перезапуск сценарію; показ
+    зменшеної JPEG копії не перекодовує повне фото при кожному rerun.
+    """
+    from PIL import Image
+    from demo_engine import open_scaled
     
-    for i in range(base_frames):
-        frame = image.copy()
-        
-        # Створюємо маски для різних областей
-        width, height = frame.size
-        
-        if animate_hair:
-            # Імітуємо рух волосся - легкі хвилі
-            wave_strength = np.sin(i * 0.3) * 2
-            # Застосовуємо деформацію до верхньої частини
-            top_region = frame.crop((0, 0, width, height // 3))
-            # Простий зсув для імітації руху волосся
-            offset = int(wave_strength)
-            if offset != 0:
-                shifted = Image.new('RGB', top_region.size, (0, 0, 0))
-                if offset > 0:
-                    shifted.paste(top_region.crop((offset, 0, width, height // 3)), (0, 0))
-                else:
-                    shifted.paste(top_region.crop((0, 0, width + offset, height // 3)), (-offset, 0))
-                frame.paste(shifted, (0, 0))
-        
-        if animate_clothes:
-            # Імітуємо рух одягу - легке коливання
-            cloth_wave = np.sin(i * 0.25) * 1.5
-            # Застосовуємо до середньої частини зображення
-            mid_region = frame.crop((0, height // 3, width, 2 * height // 3))
-            offset = int(cloth_wave)
-            if offset != 0:
-                shifted = Image.new('RGB', mid_region.size, (0, 0, 0))
-                if offset > 0:
-                    shifted.paste(mid_region.crop((offset, 0, width, height // 3)), (0, 0))
-                else:
-                    shifted.paste(mid_region.crop((0, 0, width + offset, height // 3)), (-offset, 0))
-                frame.paste(shifted, (0, height // 3))
-        
-        if animate_water:
-            # Імітуємо рух води - рипплі ефект
-            ripple_strength = np.sin(i * 0.4) * 3
-            # Застосовуємо хвилястий ефект
-            enhancer = ImageEnhance.Brightness(frame)
-            brightness = 1.0 + np.sin(i * 0.5) * 0.05
-            frame = enhancer.enhance(brightness)
-            
-            # Додаємо легке розмиття для ефекту води
-            if i % 3 == 0:
-                frame = frame.filter(ImageFilter.GaussianBlur(0.5))
-        
-        if animate_fire:
-            # Імітуємо полум'я - мерехтіння
-            flicker = 1.0 + np.sin(i * 0.8) * 0.1 + np.random.normal(0, 0.02)
-            enhancer = ImageEnhance.Brightness(frame)
-            frame = enhancer.enhance(flicker)
-            
-            # Додаємо теплі тони
-            enhancer = ImageEnhance.Color(frame)
-            frame = enhancer.enhance(1.1)
-        
-        if animate_eyes:
-            # Імітуємо моргання - зміна яскравості очей
-            if i % 12 == 0:  # Моргання кожні 1.5 секунди
-                # Затемнюємо центральну область (очі)
-                eye_region = frame.crop((width//4, height//4, 3*width//4, 2*height//3))
-                enhancer = ImageEnhance.Brightness(eye_region)
-                darkened = enhancer.enhance(0.7)
-                frame.paste(darkened, (width//4, height//4))
-        
-        if animate_smoke:
-            # Імітуємо рух диму - плавний підйом
-            smoke_offset = i * 0.5
-            # Застосовуємо градієнт прозорості
-            overlay = Image.new('RGBA', frame.size, (255, 255, 255, 0))
-            draw = ImageDraw.Draw(overlay)
-            
-            # Створюємо ефект диму
-            for y in range(0, height, 20):
-                alpha = int(30 * np.sin(y * 0.1 + smoke_offset))
-                if alpha > 0:
-                    draw.rectangle([0, y, width, y+10], fill=(200, 200, 200, alpha))
-            
-            frame = Image.alpha_composite(frame.convert('RGBA'), overlay).convert('RGB')
+    image = Image.open(io.BytesIO(data))
+    info = {"width": image.width, "height": image.height, "format": image.format, "mode": image.mode}
+    preview = open_scaled(data, DISPLAY_MAX_EDGE).convert("RGB")
+    buffer = io.BytesIO()
+    preview.save(buffer, "JPEG", quality=90)
+    info["preview"] = buffer.getvalue()
+    return info
+
+def show_run_timings(run_kind, runs):
+    """Звіт про тривалість запусків сценарію в боковій панелі"""
+    reruns = sorted(runs[1:])
+    st.sidebar.caption(
+        f"⏱️ Цей запуск ({run_kind}): {runs[-1] * 1000:.0f} мс"
+        + (f" · медіана rerun сесії: {reruns[len(reruns) // 2] * 1000:.0f} мс" if reruns else "")
+    )
+    st.sidebar.table([
+        {"запуск": kind, "кількість": s["count"], "середнє, мс": round(s["mean"] * 1000)}
+        for kind, s in sorted(get_metrics().run_summary().items())
+    ])
+
+def show_job_timings(job):
+    """Панель налагодження: розбивка часу задачі по етапах"""
+    with st.expander(f"🐞 Таймінги задачі {job.trace.job_id}"):
+        st.table([
+            {"етап": span["stage"], "початок, с": span["offset"], "тривалість, с": span["seconds"],
+             "байт": span.get("payload_bytes", ""), "результат": span["outcome"]}
+            for span in job.trace.breakdown()
+        ])
+
+def show_provider_timings(job):
+    """Підсумок провайдерів задачі: статус і час кожного"""
+    timings = job.details.get("timings") or {}
+    if timings:
+        st.caption(" · ".join(
+            f"{name}: {t['status']}" + (f" за {t['seconds']:.1f} с" if t["seconds"] is not None else "")
+            for name, t in timings.items()
+        ))
+    return timings
+
+def show_active_jobs(job_ids):
+    """Прогрес незавершених задач; оновлюється фрагментом без перезапуску сторінки"""
+    job_queue = get_job_queue()
+    for job in job_queue.jobs(job_ids):
+        if job.status == QUEUED:
+            col_status, col_cancel = st.columns([4, 1])
+            col_status.caption(f"⏳ {job.label}: у черзі, позиція {job_queue.position(job)}")
+            if col_cancel.button("✖ Скасувати", key=f"cancel_{job.id}"):
+                # Професійна задача, що не дійшла до виконання, повертає генерацію в квоту
+                quota_key = job.details.get("quota_key")
+                if job_queue.cancel(job.id) and quota_key:
+                    get_animator().rate_limiter.refund(quota_key)
+        elif job.active:
+            st.progress(job.progress, text=f"🎬 {job.label}: {job.message} ({int(job.seconds)} с)")
+            if job.details.get("preview"):
+                st.image(job.details["preview"], caption=f"👀 Превʼю: {job.label}", width=320)
+        else:
+            # Задача завершилась — повний перезапуск покаже її результат
+            st.rerun()
+
+def show_job_result(job, show_timings=False):
+    """Результат завершеної задачі"""
+    result = job.result
+    if job.status == CANCELED:
+        st.caption(f"✖ {job.label}: скасовано")
+    elif job.status == FAILED:
+        st.error(f"❌ {job.label}: {job.error}")
+        for name, t in show_provider_timings(job).items():
+            if t["error"]:
+                st.warning(f"{name}: {t['error']}")
+    elif result["mode"] == "demo":
+        from demo_engine import OUTPUT_FORMATS
         
-        # Додаємо загальний тремтіння для живості
-        global_tremor = np.random.normal(0, 0.3)
-        if abs(global_tremor) > 0.1:
-            offset_x = int(global_tremor)
-            offset_y = int(np.random.normal(0, 0.2))
-            
-            shifted = Image.new('RGB', frame.size, (0, 0, 0))
-            paste_x = max(0, offset_x)
-            paste_y = max(0, offset_y)
-            crop_x = max(0, -offset_x)
-            crop_y = max(0, -offset_y)
-            
-            cropped = frame.crop((crop_x, crop_y, frame.width + crop_x, frame.height + crop_y))
-            shifted.paste(cropped, (paste_x, paste_y))
-            frame = shifted
+        st.success(f"✅ {job.label}: оживлення готове!" + (" ⚡ З кешу" if result["from_cache"] else ""))
+        output_format = result["format"]
+        extension = "png" if output_format == "apng" else output_format
+        st.image(result["animation"], caption="🎬 Оживлене зображення")
+        st.download_button(
+            f"📥 Завантажити {ANIMATION_FORMATS[output_format]}",
+            result["animation"],
+            f"animated_{int(job.finished)}.{extension}",
+            OUTPUT_FORMATS[output_format],
+            key=f"download_{job.id}"
+        )
+        st.info(f"""
+        **Параметри оживлення:**
+        - 🎬 Промпт: {result['prompt']}
+        - ⏱️ Тривалість: 3 секунди
+        - 🎯 FPS: 8 кадрів/сек
+        - 📄 Формат: Анімований {ANIMATION_FORMATS[result['format']]} ({len(result['animation']) / 1e6:.1f} МБ)
+        - 🔧 Технологія: Імітація LTX-стилю
+        - 🎲 Seed: {result['seed']}
+        - 📐 Роздільність: {result['tier']}
+        - ⏱️ Час: {job.seconds:.1f} с
+        """)
+    else:
+        service = result["provider"]
+        st.success(f"✅ {job.label}: професійне LTX-Video готове!" + {
+            HIT: " ⚡ З кешу", COALESCED: " 🔗 Спільна генерація з ідентичним запитом",
+        }.get(result["cache"], ""))
+        show_provider_timings(job)
+        video_path = result["video_path"]
+        if video_path and os.path.exists(video_path):
+            # Локальна копія: Streamlit віддає її з підтримкою Range
+            st.video(video_path)
+            with open(video_path, "rb") as f:
+                st.download_button("📥 Завантажити MP4", f.read(), f"ltx_video_{int(job.finished)}.mp4",
+                                   "video/mp4", key=f"download_{job.id}")
+        else:
+            if job.details.get("store_error"):
+                st.caption(f"⚠️ Локальна копія недоступна: {job.details['store_error']}")
+            st.video(result["video_url"])
+        st.info(f"""
+        **Параметри LTX-Video:**
+        - 🎬 Промпт: {result['prompt']}
+        - ⏱️ Тривалість: {result['duration']} сек
+        - 🎯 Якість: {result['quality']}
+        - 🔧 Сервіс: {service}
+        - 📄 Формат: MP4 відео
+        - 🚀 Технологія: Справжній LTX-Video
+        """)
         
-        frames.append(frame)
-    
-    # Створюємо GIF з високим FPS для плавності
-    output = io.BytesIO()
-    frames[0].save(output, format='GIF', 
-                   save_all=True, append_images=frames[1:], 
-                   duration=120,  # 120ms = ~8 FPS
-                   loop=0)
-    output.seek(0)
-    
-    return output.getvalue()
+        if service in ("replicate_ltx", "segmind_direct"):
+            client = get_animator().clients["replicate" if service == "replicate_ltx" else "segmind"]
+            conn = client.connection_stats()
+            st.caption(
+                f"HTTP: {conn['requests']} запитів, {conn['retries']} повторів, "
+                f"{conn['connections_opened']} нових зʼєднань, "
+                f"{conn['connections_reused']} перевикористано"
+            )
+    if show_timings and job.trace is not None:
+        show_job_timings(job)
 
 # Основний інтерфейс
 st.title("🎬 Справжнє Оживлення Зображень — LTX-Video Клон")
@@ -293,27 +256,40 @@ mode = st.radio(
     ]
 )
 
-# Завантаження зображення
-uploaded_image = st.file_uploader(
-    "📤 Завантажте зображення для оживлення",
+# Завантаження зображень: кожне стає окремою задачею з тим самим промптом
+uploaded_images = st.file_uploader(
+    "📤 Завантажте зображення для оживлення (можна кілька)",
     type=['png', 'jpg', 'jpeg'],
+    accept_multiple_files=True,
     help="Краще працює з портретами, людьми, тваринами"
 )
 
-if uploaded_image:
-    image = Image.open(uploaded_image)
+# Перемикач панелі налагодження з таймінгами етапів
+show_timings = st.sidebar.checkbox("🐞 Таймінги етапів", value=False)
+
+# Задачі виконуються у фоновій черзі; сесія памʼятає лише їхні ідентифікатори
+job_queue = get_job_queue()
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+session_jobs = st.session_state.setdefault("job_ids", [])
+
+if uploaded_images:
+    from animator import DEFAULT_HEDGE_DELAY, DEMO_SEED
+    
+    image = describe_upload(uploaded_images[0].getvalue())
     
     col1, col2 = st.columns(2)
     
     with col1:
-        st.image(image, caption="🖼️ Оригінальне зображення", use_column_width=True)
+        st.image(image["preview"], caption="🖼️ Оригінальне зображення", use_column_width=True)
+        if len(uploaded_images) > 1:
+            st.caption(f"➕ Ще {len(uploaded_images) - 1} зображень отримають той самий промпт")
         
         # Аналіз зображення
         st.info(f"""
         **Параметри зображення:**
-        - 📐 Розмір: {image.width} × {image.height}
-        - 📄 Формат: {image.format}
-        - 🎨 Режим: {image.mode}
+        - 📐 Розмір: {image['width']} × {image['height']}
+        - 📄 Формат: {image['format']}
+        - 🎨 Режим: {image['mode']}
         """)
     
     with col2:
@@ -330,6 +306,24 @@ if uploaded_image:
         if "Професійний" in mode:
             duration = st.slider("⏱️ Тривалість (секунди)", 2, 6, 4)
             quality = st.selectbox("🎯 Якість", ["Стандарт (8 FPS)", "Висока (24 FPS)"])
+            hedge_delay = st.slider(
+                "⏳ Затримка перед запуском наступного API (секунди, 0 — всі одразу)",
+                0, 120, DEFAULT_HEDGE_DELAY
+            )
+        else:
+            seed = st.number_input("🎲 Seed (однаковий seed — однакова анімація)",
+                                   min_value=0, value=DEMO_SEED, step=1)
+            full_render = st.checkbox("🔍 Після превʼю рендерити повну роздільність", value=True)
+            output_format = st.selectbox(
+                "📄 Формат анімації", list(ANIMATION_FORMATS), format_func=ANIMATION_FORMATS.get,
+                help="GIF — найсумісніший; WebP — повноколірний і найменший; APNG — без втрат"
+            )
+            full_max_edge = st.select_slider(
+                "📐 Макс. роздільність повного рендеру (довша сторона)",
+                options=[1024, 2048, 4096, "Оригінал"], value=2048
+            )
+            if full_max_edge == "Оригінал":
+                full_max_edge = None
         
         # Приклади промптів для оживлення
         with st.expander("💡 Приклади для різних типів зображень"):
@@ -365,105 +359,93 @@ if uploaded_image:
 
     # Кнопка генерації
     if st.button("🎬 ОЖИВИТИ ЗОБРАЖЕННЯ", type="primary", use_container_width=True):
+        # Спільні ресурси створюються в основному потоці сценарію
+        animator = get_animator()
         if not prompt.strip():
             st.error("❌ Опишіть що має рухатися в зображенні!")
+        elif "Професійний" in mode and not animator.providers():
+            st.error("""
+            ❌ **Потрібен API ключ!**
+            
+            Додайте один з токенів у Settings → Secrets:
+            - `REPLICATE_TOKEN = "r8_..."`
+            - `SEGMIND_TOKEN = "ваш_ключ"`  
+            - `FAL_KEY = "ваш_ключ"`
+            """)
         else:
-            if "Демо" in mode:
-                with st.spinner("🎨 Створюємо оживлення в стилі LTX... 20 секунд"):
-                    animation_data = create_demo_with_ltx_style(image, prompt)
-                    
-                    if animation_data:
-                        st.success("✅ Оживлення готове!")
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.image(image, caption="Оригінал")
-                        
-                        with col2:
-                            st.image(animation_data, caption="🎬 Оживлене зображення")
-                        
-                        st.download_button(
-                            "📥 Завантажити GIF",
-                            animation_data,
-                            f"animated_{int(time.time())}.gif",
-                            "image/gif"
-                        )
-                        
-                        st.info(f"""
-                        **Параметри оживлення:**
-                        - 🎬 Промпт: {prompt}
-                        - ⏱️ Тривалість: 3 секунди
-                        - 🎯 FPS: 8 кадрів/сек
-                        - 📄 Формат: Анімований GIF
-                        - 🔧 Технологія: Імітація LTX-стилю
-                        """)
-                    else:
-                        st.error("❌ Помилка створення оживлення")
-                        
-            else:  # Професійний режим
-                api_available = (st.secrets.get("REPLICATE_TOKEN") or 
-                               st.secrets.get("SEGMIND_TOKEN") or 
-                               st.secrets.get("FAL_KEY"))
-                
-                if not api_available:
-                    st.error("""
-                    ❌ **Потрібен API ключ!**
-                    
-                    Додайте один з токенів у Settings → Secrets:
-                    - `REPLICATE_TOKEN = "r8_..."`
-                    - `SEGMIND_TOKEN = "ваш_ключ"`  
-                    - `FAL_KEY = "ваш_ключ"`
-                    """)
+            # Кожне зображення — окрема задача; результати зʼявляються в міру готовності
+            for uploaded in uploaded_images:
+                quota_key = None
+                if "Демо" in mode:
+                    trace_mode = "demo"
+                    run = functools.partial(animator.run_demo_job, image_bytes=uploaded.getvalue(),
+                                            prompt=prompt, seed=seed, full_render=full_render,
+                                            full_max_edge=full_max_edge, output_format=output_format)
                 else:
-                    with st.spinner("🚀 Створюємо професійне LTX-Video... 1-3 хвилини"):
-                        video_url = None
-                        service = None
-                        
-                        # Спробуємо різні API по черзі
-                        if st.secrets.get("REPLICATE_TOKEN"):
-                            task_id, service = generate_video_replicate_ltx(image, prompt, duration)
-                            
-                            if task_id:
-                                progress_bar = st.progress(0)
-                                status_text = st.empty()
-                                
-                                for i in range(60):  # 5 хвилин максимум
-                                    status = check_replicate_status(task_id)
-                                    
-                                    if status:
-                                        if status.get("status") == "succeeded":
-                                            video_url = status.get("output")
-                                            break
-                                        elif status.get("status") == "failed":
-                                            st.error("❌ Помилка Replicate генерації")
-                                            break
-                                    
-                                    progress_bar.progress((i + 1) / 60)
-                                    status_text.text(f"LTX-Video обробка... {i*5} секунд")
-                                    time.sleep(5)
-                        
-                        elif st.secrets.get("SEGMIND_TOKEN"):
-                            video_url, service = generate_video_segmind_ltx(image, prompt)
-                        
-                        elif st.secrets.get("FAL_KEY"):
-                            video_url, service = generate_video_fal_ltx(image, prompt)
-                        
-                        if video_url:
-                            st.success("✅ Професійне LTX-Video готове!")
-                            st.video(video_url)
-                            
-                            st.info(f"""
-                            **Параметри LTX-Video:**
-                            - 🎬 Промпт: {prompt}
-                            - ⏱️ Тривалість: {duration} сек
-                            - 🎯 Якість: {quality}
-                            - 🔧 Сервіс: {service}
-                            - 📄 Формат: MP4 відео
-                            - 🚀 Технологія: Справжній LTX-Video
-                            """)
-                        else:
-                            st.error("❌ Всі API недоступні. Спробуйте пізніше або використайте демо режим.")
+                    trace_mode = "professional"
+                    providers = animator.providers()
+                    # Квота сесії і денний бюджет перевіряються до постановки в чергу
+                    try:
+                        quota_key = animator.rate_limiter.admit(session_id, providers)
+                    except AdmissionError as e:
+                        get_metrics().increment("ltx_admission", mode=trace_mode, result="rejected")
+                        st.warning(f"⏳ {uploaded.name}: не прийнято — {e}")
+                        continue
+                    run = functools.partial(animator.run_professional_job, image_bytes=uploaded.getvalue(),
+                                            prompt=prompt, duration=duration, quality=quality,
+                                            hedge_delay=hedge_delay, providers=providers,
+                                            quota_key=quota_key)
+                try:
+                    job = job_queue.submit(session_id, uploaded.name, run,
+                                           trace=Trace(trace_mode, get_metrics()))
+                except QueueFull as e:
+                    if quota_key:
+                        animator.rate_limiter.refund(quota_key)
+                    get_metrics().increment("ltx_admission", mode=trace_mode, result="queue_full")
+                    st.warning(f"⏳ {uploaded.name}: не прийнято — {e}")
+                    continue
+                if quota_key:
+                    job.update(quota_key=quota_key)  # для повернення квоти при скасуванні
+                session_jobs.append(job.id)
+
+# Задачі сесії: результати завершених і живий прогрес активних
+jobs = job_queue.jobs(session_jobs)
+session_jobs[:] = [job.id for job in jobs]  # забуті чергою задачі більше не показуємо
+if jobs:
+    st.subheader("🗂️ Задачі")
+    finished = [job for job in jobs if not job.active]
+    for job in finished:
+        show_job_result(job, show_timings)
+    
+    if any(job.result and job.result["mode"] == "demo" for job in finished):
+        cache_stats = get_animator().render_cache.stats
+        st.caption(
+            f"Кеш: {cache_stats['memory_hits']} у пам'яті, "
+            f"{cache_stats['disk_hits']} з диска, {cache_stats['misses']} промахів"
+        )
+    if any(job.details.get("timings") for job in finished):
+        with st.expander("📊 Швидкість і стан провайдерів"):
+            animator = get_animator()
+            limits = animator.rate_limiter.snapshot()
+            for name, h in animator.router.snapshot().items():
+                limit = limits.get(name, {})
+                st.markdown(
+                    f"**{name}** — {h['state']}, успішність {h['success_rate']:.0%}, "
+                    f"середній час {h['mean_completion']:.0f} с ({h['samples']} генерацій); "
+                    f"зайнято {limit.get('running', 0)}/{limit.get('concurrency', '∞')}, "
+                    f"у черзі {limit.get('waiting', 0)}"
+                )
+            st.caption(f"Оцінка витрат за добу: ${animator.rate_limiter.spent():.2f} з ${DAILY_BUDGET_USD:.2f}")
+    
+    active_ids = [job.id for job in jobs if job.active]
+    if active_ids:
+        st.fragment(show_active_jobs, run_every=JOB_REFRESH_SECONDS)(active_ids)
+    if finished and st.button("🧹 Прибрати завершені задачі"):
+        job_queue.forget([job.id for job in finished])
+        st.rerun()
+    
+    queue_stats = job_queue.stats()
+    st.caption(f"Черга: {queue_stats[QUEUED]} очікують, {queue_stats[RUNNING]} виконуються")
 
 # Поради
 with st.expander("🎯 Поради для найкращого оживлення"):
@@ -489,3 +471,13 @@ with st.expander("🎯 Поради для найкращого оживленн
 st.markdown("---")
 st.markdown("**🎬 Демо режим: Імітація LTX-Video стилю | Професійний: Справжній LTX-Video**")
 st.markdown("**🇺🇦 Створено для української творчої спільноти**")
+
+# Тривалість запуску сценарію: холодний старт процесу, перший запуск сесії, rerun
+run_seconds = time.perf_counter() - RUN_START
+runs = st.session_state.setdefault("run_seconds", [])
+run_kind = "cold" if next(get_run_counter()) == 0 else "rerun" if runs else "session"
+runs.append(run_seconds)
+del runs[:-50]
+get_metrics().observe_run(run_kind, run_seconds)
+if show_timings:
+    show_run_timings(run_kind, runs)
@@ -0,0 +1,452 @@
+"""Бенчмарк демо рендеру та шляху до провайдерів (без Streamlit).
+
+Демо режим проганяє матрицю роздільностей × наборів ефектів × кількості
+кадрів; кожен випадок виконується в окремому процесі, щоб пікова RSS
+належала саме йому. Результати пишуться в JSON, а з ``--baseline``
+порівнюються з попереднім запуском: якщо якийсь випадок повільніший за
+поріг, скрипт завершується з кодом 1. ``--workers`` додає вимір кількості
+потоків рендеру і звіт масштабування (прискорення та ефективність
+відносно одного потоку).
+
+Режим ``formats`` рендерить кадри один раз і порівнює кодувальники
+вихідної анімації: поточний PIL GIF, потоковий GIF з повними кадрами,
+дельта-GIF, анімований WebP і APNG — час кодування і розмір файлу.
+
+Режим ``provider`` піднімає локальний фейковий сервер Replicate з заданою
+затримкою і проганяє через чергу задач справжню професійну задачу
+``Animator.run_professional_job`` (підготовка зображення, лімітер,
+відправка, очікування, хеджування, збереження відео), вимірюючи накладні
+витрати повного циклу без витрати кредитів.
+
+    python benchmark.py demo --resolutions 0.3 2 12 --output bench.json
+    python benchmark.py demo --baseline bench.json --threshold 0.2
+    python benchmark.py demo --resolutions 12 24 --effects all --workers 1 2 4 8 16
+    python benchmark.py formats --resolutions 0.3 2 --effects none default_prompt all
+    python benchmark.py provider --latency 0.2 --completion 3 --jobs 5
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+import demo_engine
+
+RESOLUTIONS = {  # мегапікселі -> (ширина, висота), 4:3
+    "0.3": (640, 480),
+    "2": (1632, 1224),
+    "5": (2592, 1944),
+    "12": (4000, 3000),
+    "24": (5664, 4248),
+}
+EFFECT_SETS = {
+    "none": (),
+    **{name: (name,) for name in demo_engine.EFFECT_KEYWORDS},
+    "default_prompt": ("hair", "eyes", "clothes"),
+    "all": tuple(demo_engine.EFFECT_KEYWORDS),
+}
+DEFAULT_RESOLUTIONS = ["0.3", "2", "12"]
+DEFAULT_EFFECTS = ["none", "hair", "clothes", "water", "fire", "eyes", "smoke", "all"]
+DEFAULT_FRAMES = [demo_engine.FRAME_COUNT]
+DEFAULT_WORKERS = [1]
+DEFAULT_THRESHOLD = 0.2  # +20% часу вважається регресією
+SEED = 42
+
+
+def synthetic_image(width, height, seed=SEED):
+    """Детерміноване зображення, схоже на фото: градієнти, деталі та шум"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    r = 255 * x / width
+    g = 255 * y / height
+    b = 128 + 100 * np.sin(x / 37.0) * np.cos(y / 53.0)
+    pixels = np.stack([r, g, b], axis=-1) + rng.normal(0, 8, (height, width, 3))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def peak_rss_mb():
+    """Пікова RSS поточного процесу в мегабайтах"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_demo_case(resolution, effects, frames, workers=1):
+    """Один випадок демо бенчмарку; виконується в окремому процесі
+
+    З одним потоком рендер і кодування міряються окремо; з кількома вони
+    перемежовуються в пулі, тож звітуються разом як ``render_encode``.
+    """
+    width, height = RESOLUTIONS[resolution]
+    source = io.BytesIO()
+    synthetic_image(width, height).save(source, format="JPEG", quality=90)
+    data = source.getvalue()
+    rss_before = peak_rss_mb()
+
+    timings = {}
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+    base = demo_engine.image_to_array(image)
+    timings["decode"] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    palette = demo_engine.build_palette(base)
+    timings["palette"] = time.perf_counter() - mark
+
+    if workers > 1:
+        mark = time.perf_counter()
+        output = demo_engine.render_gif(base, frozenset(EFFECT_SETS[effects]), palette, frames,
+                                        rng=np.random.default_rng(SEED), workers=workers)
+        timings["render_encode"] = time.perf_counter() - mark
+        return demo_case_result(resolution, effects, frames, workers, start, timings,
+                                rss_before, output)
+
+    # Рендер і кодування чергуються кадр за кадром, тож міряємо їх окремо
+    render_time = 0.0
+    frame_iter = demo_engine.iter_frames(base, frozenset(EFFECT_SETS[effects]), frames,
+                                         rng=np.random.default_rng(SEED))
+
+    def timed_frames():
+        nonlocal render_time
+        while True:
+            mark = time.perf_counter()
+            frame = next(frame_iter, None)
+            render_time += time.perf_counter() - mark
+            if frame is None:
+                return
+            yield frame
+
+    mark = time.perf_counter()
+    output = demo_engine.encode_gif_stream(timed_frames(), palette, (width, height))
+    timings["render"] = render_time
+    timings["encode"] = time.perf_counter() - mark - render_time
+    return demo_case_result(resolution, effects, frames, workers, start, timings,
+                            rss_before, output)
+
+
+def demo_case_result(resolution, effects, frames, workers, start, timings, rss_before, output):
+    wall = time.perf_counter() - start
+    return {
+        "resolution_mp": resolution,
+        "size": list(RESOLUTIONS[resolution]),
+        "effects": effects,
+        "frames": frames,
+        "workers": workers,
+        "wall_seconds": round(wall, 4),
+        "stage_seconds": {name: round(value, 4) for name, value in timings.items()},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+        "output_bytes": len(output),
+    }
+
+
+def case_key(case):
+    key = f"{case['resolution_mp']}MP/{case['effects']}/{case['frames']}f"
+    workers = case.get("workers", 1)
+    return key if workers == 1 else f"{key}/{workers}w"
+
+
+def provider_case_key(case):
+    return f"provider/{case['resolution_mp']}MP/{case['latency']}s+{case['completion']}s"
+
+
+def run_demo(args):
+    cases = [(r, e, f, w) for r in args.resolutions for e in args.effects
+             for f in args.frames for w in args.workers]
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for resolution, effects, frames, workers in cases:
+        with context.Pool(1) as pool:
+            case = pool.apply(run_demo_case, (resolution, effects, frames, workers))
+        results.append(case)
+        stages = "  ".join(f"{name} {value:6.2f} s" for name, value in case["stage_seconds"].items()
+                           if name not in ("decode", "palette"))
+        print(f"{case_key(case):36} {case['wall_seconds']:8.2f} s  {stages}  "
+              f"RSS {case['peak_rss_mb']:7.1f} MB  {case['output_bytes'] / 1e6:6.2f} MB")
+    return results
+
+
+def scaling(results):
+    """Прискорення та ефективність кожного випадку відносно одного потоку"""
+    single = {case_key(case): case for case in results if case.get("workers", 1) == 1}
+    rows = []
+    for case in results:
+        workers = case.get("workers", 1)
+        base = single.get(f"{case['resolution_mp']}MP/{case['effects']}/{case['frames']}f")
+        if workers == 1 or not base:
+            continue
+        speedup = base["wall_seconds"] / max(case["wall_seconds"], 1e-9)
+        rows.append({"case": case_key(case), "workers": workers,
+                     "speedup": round(speedup, 2), "efficiency": round(speedup / workers, 2)})
+    return rows
+
+
+FORMAT_ENCODERS = {
+    "gif_pil": lambda frames, palette, size: demo_engine.encode_gif(frames),
+    "gif_full": lambda frames, palette, size: demo_engine.encode_gif_stream(frames, palette, size, delta=False),
+    "gif_delta": lambda frames, palette, size: demo_engine.encode_gif_stream(frames, palette, size),
+    "webp": lambda frames, palette, size: demo_engine.encode_webp(frames),
+    "apng": lambda frames, palette, size: demo_engine.encode_apng(frames),
+}
+
+
+def run_formats(args):
+    """Час кодування і розмір кожного формату на тих самих кадрах"""
+    results = []
+    for resolution in args.resolutions:
+        width, height = RESOLUTIONS[resolution]
+        base = demo_engine.image_to_array(synthetic_image(width, height))
+        palette = demo_engine.build_palette(base)
+        for effects in args.effects:
+            frames = demo_engine.render_frames(base, frozenset(EFFECT_SETS[effects]),
+                                               rng=np.random.default_rng(SEED))
+            reference = None
+            for name, encode in FORMAT_ENCODERS.items():
+                start = time.perf_counter()
+                output = encode(frames, palette, (width, height))
+                seconds = time.perf_counter() - start
+                reference = reference or (seconds, len(output))
+                case = {
+                    "resolution_mp": resolution,
+                    "effects": effects,
+                    "format": name,
+                    "encode_seconds": round(seconds, 4),
+                    "output_bytes": len(output),
+                    "time_vs_gif_pil": round(seconds / reference[0], 2),
+                    "size_vs_gif_pil": round(len(output) / reference[1], 3),
+                }
+                results.append(case)
+                print(f"{resolution}MP/{effects:16} {name:10} {seconds:7.2f} s (×{case['time_vs_gif_pil']:.2f})  "
+                      f"{len(output) / 1e6:7.2f} MB (×{case['size_vs_gif_pil']:.3f})")
+    return results
+
+
+def compare(results, baseline, threshold, key=case_key):
+    """Повертає список регресій відносно попереднього запуску того ж режиму"""
+    previous = {key(case): case for case in baseline.get("results", [])}
+    regressions = []
+    for case in results:
+        old = previous.get(key(case))
+        if not old:
+            continue
+        ratio = case["wall_seconds"] / max(old["wall_seconds"], 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{key(case)}: {old['wall_seconds']:.2f} s -> {case['wall_seconds']:.2f} s (×{ratio:.2f})"
+            )
+    return regressions
+
+
+FAKE_VIDEO = b"\x00\x00\x00\x18ftypmp42" + bytes(64 * 1024)
+
+
+class FakeReplicate:
+    """Локальний фейковий Replicate: затримка відповіді, час генерації і CDN з відео"""
+
+    def __init__(self, latency, completion):
+        self.latency = latency
+        self.completion = completion
+        self.created = {}
+        self.bytes_received = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                time.sleep(fake.latency)
+                with fake._lock:
+                    fake.requests += 1
+                    fake.bytes_received += length
+                    prediction_id = f"fake{len(fake.created)}"
+                    fake.created[prediction_id] = time.monotonic()
+                self._reply(201, {"id": prediction_id, "status": "starting"})
+
+            def do_GET(self):
+                time.sleep(fake.latency)
+                if self.path.startswith("/video/"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "video/mp4")
+                    self.send_header("Content-Length", str(len(FAKE_VIDEO)))
+                    self.end_headers()
+                    self.wfile.write(FAKE_VIDEO)
+                    return
+                prediction_id = self.path.rsplit("/", 1)[-1]
+                with fake._lock:
+                    fake.requests += 1
+                    created = fake.created.get(prediction_id)
+                if created is None:
+                    self._reply(404, {"detail": "not found"})
+                    return
+                elapsed = time.monotonic() - created
+                if elapsed >= fake.completion:
+                    body = {"id": prediction_id, "status": "succeeded",
+                            "output": f"{fake.base}/video/{prediction_id}.mp4"}
+                else:
+                    body = {"id": prediction_id, "status": "processing" if elapsed > fake.completion / 3 else "starting"}
+                self._reply(200, body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.url = f"{self.base}/v1/predictions"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_provider(args):
+    from animator import Animator
+    from job_queue import DONE, JobQueue
+    from provider_client import ProviderClient
+    from tracing import Trace
+    from video_store import VideoStore
+
+    fake = FakeReplicate(args.latency, args.completion)
+    store_dir = tempfile.TemporaryDirectory()
+    animator = Animator(
+        {"REPLICATE_TOKEN": "benchmark"}, replicate_api=fake.url,
+        video_store=VideoStore(ProviderClient("cdn", {}), store_dir=store_dir.name,
+                               allowed_hosts=("127.0.0.1",)),
+    )
+    queue = JobQueue(workers=1, max_finished_bytes=None, finished_ttl=None)
+    width, height = RESOLUTIONS[args.resolution]
+    source = io.BytesIO()
+    synthetic_image(width, height).save(source, format="JPEG", quality=90)
+
+    jobs = []
+    try:
+        for i in range(args.jobs):
+            # Різні промпти, щоб кеш генерацій не віддав результат попередньої задачі
+            job = queue.submit("benchmark", f"job {i}", partial(
+                animator.run_professional_job, image_bytes=source.getvalue(), prompt=f"benchmark {i}",
+                hedge_delay=0, providers=["replicate_ltx"],
+            ), trace=Trace("professional", animator.metrics))
+            while job.active:
+                time.sleep(0.01)
+            if job.status != DONE:
+                raise RuntimeError(f"задача {i + 1} завершилась з помилкою: {job.error}")
+
+            stages = {}
+            for span in job.trace.breakdown():
+                stages[span["stage"]] = round(stages.get(span["stage"], 0.0) + span["seconds"], 4)
+                if span["stage"] == "replicate_wait":
+                    stages["polls"] = span.get("polls")
+                if span["stage"] == "prepare_upload":
+                    stages["upload_bytes"] = span.get("payload_bytes")
+            wall = job.seconds
+            jobs.append({
+                "wall_seconds": round(wall, 4),
+                "overhead_seconds": round(wall - args.completion, 4),
+                "stages": stages,
+            })
+            print(f"job {len(jobs):3}: {wall:6.2f} s, overhead {wall - args.completion:5.2f} s, "
+                  f"polls {stages.get('polls')}, upload {(stages.get('upload_bytes') or 0) / 1024:.0f} KB")
+    finally:
+        fake.close()
+        store_dir.cleanup()
+
+    return [{
+        "resolution_mp": args.resolution,
+        "latency": args.latency,
+        "completion": args.completion,
+        "wall_seconds": round(sum(j["wall_seconds"] for j in jobs) / len(jobs), 4),
+        "connections": animator.clients["replicate"].connection_stats(),
+        "jobs": jobs,
+    }]
+
+
+CASE_KEYS = {"demo": case_key, "provider": provider_case_key}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    demo = sub.add_parser("demo", help="матриця демо рендеру")
+    demo.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, choices=list(RESOLUTIONS))
+    demo.add_argument("--effects", nargs="+", default=DEFAULT_EFFECTS, choices=list(EFFECT_SETS))
+    demo.add_argument("--frames", nargs="+", type=int, default=DEFAULT_FRAMES)
+    demo.add_argument("--workers", nargs="+", type=int, default=DEFAULT_WORKERS,
+                      help="кількість потоків рендеру; кілька значень — звіт масштабування")
+
+    formats = sub.add_parser("formats", help="розмір і час кодування форматів анімації")
+    formats.add_argument("--resolutions", nargs="+", default=["0.3", "2"], choices=list(RESOLUTIONS))
+    formats.add_argument("--effects", nargs="+", default=["none", "default_prompt", "all"],
+                         choices=list(EFFECT_SETS))
+    formats.add_argument("--output", help="куди записати JSON результати")
+
+    provider = sub.add_parser("provider", help="шлях до провайдера через фейковий сервер")
+    provider.add_argument("--latency", type=float, default=0.1, help="затримка кожної відповіді, с")
+    provider.add_argument("--completion", type=float, default=3.0, help="час генерації, с")
+    provider.add_argument("--jobs", type=int, default=3)
+    provider.add_argument("--resolution", default="12", choices=list(RESOLUTIONS))
+
+    for p in (demo, provider):
+        p.add_argument("--output", help="куди записати JSON результати")
+        p.add_argument("--baseline", help="JSON попереднього запуску для порівняння")
+        p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="допустиме відносне сповільнення (0.2 = +20%%)")
+    args = parser.parse_args(argv)
+
+    runners = {"demo": run_demo, "formats": run_formats, "provider": run_provider}
+    results = runners[args.mode](args)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": multiprocessing.cpu_count(),
+        "mode": args.mode,
+        "results": results,
+    }
+    if args.mode == "demo" and len(args.workers) > 1:
+        report["scaling"] = scaling(results)
+        for row in report["scaling"]:
+            print(f"{row['case']:36} ×{row['speedup']:5.2f}  ефективність {row['efficiency']:.0%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if getattr(args, "baseline", None):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("mode", "demo") != args.mode:
+            print(f"Базовий запуск має режим {baseline.get('mode')}, а не {args.mode}")
+            return 2
+        regressions = compare(results, baseline, args.threshold, CASE_KEYS[args.mode])
+        for line in regressions:
+            print(f"РЕГРЕСІЯ {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
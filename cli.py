@@ -0,0 +1,238 @@
+"""Пакетне оживлення зображень без Streamlit.
+
+Джерело — каталог із зображеннями (усі отримують ``--prompt``) або
+маніфест: CSV з колонками ``image,prompt`` (необовʼязкові ``seed``,
+``duration``, ``output``) чи JSON Lines з тими самими полями; відносні
+шляхи рахуються від каталогу маніфесту. Задачі йдуть через ту саму
+``JobQueue``, що й в інтерфейсі, по ``--workers`` одночасно; кожна
+задача рендерить у ``--render-workers`` потоків. Результати пишуться в
+``--output``, а звіт пропускної здатності (час кожної задачі з
+розбивкою по етапах, задач за хвилину, перцентилі) — у ``--report``.
+
+Професійний режим бере ключі зі змінних середовища з тими самими
+назвами, що й у Secrets (``REPLICATE_TOKEN``, ``SEGMIND_TOKEN``,
+``FAL_KEY``); денний бюджет ``--budget`` діє як і в інтерфейсі, квоти
+сесій — ні.
+
+    python cli.py demo photos/ --prompt "волосся хитається" --output out --workers 4
+    python cli.py demo jobs.csv --format webp --no-cache --report bench.json
+    python cli.py professional jobs.jsonl --output videos --workers 2 --hedge-delay 0
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import time
+
+from animator import DEFAULT_HEDGE_DELAY, DEMO_SEED, Animator, env_secrets
+from demo_engine import PREVIEW_MAX_EDGE
+from job_queue import DONE, JobQueue
+from rate_limit import DEFAULT_DAILY_BUDGET, RateLimiter
+from render_cache import RenderCache
+from tracing import Trace
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+EXTENSIONS = {"gif": "gif", "webp": "webp", "apng": "png"}  # формат -> розширення файлу
+POLL_SECONDS = 0.2
+
+
+def read_items(source, prompt=None):
+    """Список задач ``{"image", "prompt", ...}`` з каталогу або маніфесту"""
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+        items = [{"image": os.path.join(source, name)} for name in names]
+    else:
+        with open(source, newline="", encoding="utf-8") as f:
+            if source.endswith(".csv"):
+                items = list(csv.DictReader(f))
+            else:
+                items = [json.loads(line) for line in f if line.strip()]
+        base = os.path.dirname(os.path.abspath(source))
+        for item in items:
+            item["image"] = os.path.join(base, item["image"])
+    for item in items:
+        item["prompt"] = item.get("prompt") or prompt
+        if not item["prompt"]:
+            raise ValueError(f"{item['image']}: немає промпту (колонка prompt або --prompt)")
+    return items
+
+
+def output_names(items):
+    """Унікальна назва вихідного файлу (без розширення) для кожної задачі"""
+    names = []
+    seen = {}
+    for item in items:
+        name = item.get("output") or os.path.splitext(os.path.basename(item["image"]))[0]
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}-{seen[name]}")
+    return names
+
+
+def job_function(animator, args, item):
+    """Функція задачі; файл читається вже у виконавці, а не під час постановки в чергу"""
+    def run_job(job):
+        with open(item["image"], "rb") as f:
+            image_bytes = f.read()
+        if args.mode == "demo":
+            return animator.run_demo_job(
+                job, image_bytes, item["prompt"], seed=int(item.get("seed") or args.seed),
+                full_max_edge=args.max_edge or None, output_format=args.format, preview=False,
+            )
+        return animator.run_professional_job(
+            job, image_bytes, item["prompt"], duration=int(item.get("duration") or args.duration),
+            hedge_delay=args.hedge_delay,
+        )
+    return run_job
+
+
+def save_result(job, path):
+    """Пише результат задачі у файл; повертає розмір у байтах"""
+    result = job.result
+    if result["mode"] == "demo":
+        with open(path, "wb") as f:
+            f.write(result["animation"])
+    elif result["video_path"]:
+        shutil.copyfile(result["video_path"], path)
+    else:
+        return 0
+    return os.path.getsize(path)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(rows, wall):
+    """Підсумок пропускної здатності пакета"""
+    seconds = [row["seconds"] for row in rows if row["status"] == DONE]
+    stages = {}
+    for row in rows:
+        for span in row["stages"]:
+            stages[span["stage"]] = stages.get(span["stage"], 0.0) + span["seconds"]
+    return {
+        "jobs": len(rows),
+        "done": len(seconds),
+        "failed": len(rows) - len(seconds),
+        "wall_seconds": round(wall, 3),
+        "jobs_per_minute": round(len(seconds) / wall * 60, 2) if wall else 0.0,
+        "output_bytes": sum(row["bytes"] for row in rows),
+        "mean_seconds": round(sum(seconds) / len(seconds), 3) if seconds else 0.0,
+        "p50_seconds": round(percentile(seconds, 0.5), 3),
+        "p95_seconds": round(percentile(seconds, 0.95), 3),
+        "stage_seconds": {name: round(total, 3) for name, total in sorted(stages.items())},
+    }
+
+
+def run(args):
+    items = read_items(args.source, args.prompt)
+    if not items:
+        print(f"{args.source}: немає зображень")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    animator = Animator(
+        env_secrets(), render_workers=args.render_workers, job_workers=args.workers,
+        rate_limiter=RateLimiter(daily_budget=args.budget),
+        render_cache=None if args.cache else RenderCache(cache_dir=None, max_memory_bytes=0),
+    )
+    if args.mode == "professional" and not animator.providers():
+        print("Потрібен ключ провайдера: REPLICATE_TOKEN, SEGMIND_TOKEN або FAL_KEY")
+        return 1
+
+    queue = JobQueue(workers=args.workers, max_queued=len(items), max_per_session=len(items),
+                     max_finished=len(items), max_finished_bytes=None, finished_ttl=None)
+    start = time.perf_counter()
+    jobs = [
+        queue.submit("cli", item["image"], job_function(animator, args, item),
+                     trace=Trace(args.mode, animator.metrics))
+        for item in items
+    ]
+
+    rows = []
+    pending = dict(zip(jobs, zip(items, output_names(items))))
+    while pending:
+        time.sleep(POLL_SECONDS)
+        for job in [job for job in pending if not job.active]:
+            item, name = pending.pop(job)
+            row = {
+                "image": item["image"], "prompt": item["prompt"], "status": job.status,
+                "seconds": round(job.seconds, 3), "queued_seconds": round(job.queued_seconds, 3),
+                "output": None, "bytes": 0, "error": job.error, "stages": job.trace.breakdown(),
+            }
+            if job.status == DONE:
+                extension = EXTENSIONS[args.format] if args.mode == "demo" else "mp4"
+                path = os.path.join(args.output, f"{name}.{extension}")
+                row["bytes"] = save_result(job, path)
+                row["output"] = path if row["bytes"] else job.result.get("video_url")
+            rows.append(row)
+            queue.forget([job.id])  # результат уже на диску
+            print(f"[{len(rows):4}/{len(items)}] {job.status:8} {job.seconds:7.2f} s  "
+                  f"{os.path.basename(item['image'])}" + (f"  {job.error}" if job.error else ""))
+    wall = time.perf_counter() - start
+
+    summary = summarize(rows, wall)
+    print(f"{summary['done']}/{summary['jobs']} за {summary['wall_seconds']:.1f} s — "
+          f"{summary['jobs_per_minute']:.1f} задач/хв, p50 {summary['p50_seconds']:.2f} s, "
+          f"p95 {summary['p95_seconds']:.2f} s")
+    if args.report:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": multiprocessing.cpu_count(),
+            "mode": args.mode,
+            "source": args.source,
+            "workers": args.workers,
+            "render_workers": animator.render_workers,
+            "format": args.format if args.mode == "demo" else "mp4",
+            "summary": summary,
+            "jobs": rows,
+        }
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 1 if summary["failed"] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    demo = sub.add_parser("demo", help="демо оживлення (локальний рендер)")
+    demo.add_argument("--format", default="gif", choices=list(EXTENSIONS))
+    demo.add_argument("--seed", type=int, default=DEMO_SEED)
+    demo.add_argument("--max-edge", type=int, default=2048,
+                      help=f"довша сторона результату, 0 — оригінал (превʼю — {PREVIEW_MAX_EDGE})")
+    demo.add_argument("--no-cache", dest="cache", action="store_false",
+                      help="не брати готові анімації з кешу рендеру (для бенчмарків)")
+
+    professional = sub.add_parser("professional", help="LTX-Video у провайдерів")
+    professional.add_argument("--duration", type=int, default=4, help="секунд відео")
+    professional.add_argument("--hedge-delay", type=float, default=DEFAULT_HEDGE_DELAY,
+                              help="секунд до запуску наступного провайдера")
+    professional.add_argument("--budget", type=float, default=DEFAULT_DAILY_BUDGET,
+                              help="денний бюджет, USD")
+
+    for p in (demo, professional):
+        p.add_argument("source", help="каталог із зображеннями або маніфест .csv / .jsonl")
+        p.add_argument("--prompt", help="промпт для зображень без власного")
+        p.add_argument("--output", default="output", help="каталог для результатів")
+        p.add_argument("--workers", type=int, default=2, help="одночасних задач")
+        p.add_argument("--render-workers", type=int, default=None,
+                       help="потоків рендеру на задачу (типово — ядра, поділені між задачами)")
+        p.add_argument("--report", help="куди записати JSON звіт пропускної здатності")
+    demo.set_defaults(budget=DEFAULT_DAILY_BUDGET)
+    professional.set_defaults(format="gif", cache=True)
+    args = parser.parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
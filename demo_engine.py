@@ -0,0 +1,646 @@
+"""Векторизований NumPy-рушій кадрів для демо режиму.
+
+Зображення декодується в один масив ``uint8`` (H, W, 3) лише раз. Усі
+параметри 25 кадрів (зсуви смуг, коефіцієнти яскравості й насиченості,
+альфа-рампа диму, тремтіння) обчислюються наперед масивами, після чого
+кожен кадр збирається кількома векторними операціями без PIL.
+
+Точність відносно ``render_frames_reference`` (старий PIL-цикл) при
+однаковому ``rng``: без води зсуви смуг, дим і вогонь збігаються точно,
+моргання — з точністю до 1 рівня яскравості. Розмиття води виконується один
+раз для всього зображення до зсувів і зміни яскравості, тож кадри з водою
+відрізняються: на рівномірному шумі 403 × 301 з ``tests/test_demo_engine.py``
+на всіх 64 комбінаціях ефектів середня похибка < 0.25 рівня, а понад 3 рівні
+відхиляються < 0.6% пікселів. Межа залежить від зображення: на світлому
+шумі (220 ± 30) частка таких пікселів сягає 1.7%, бо розмиття і яскравість
+по-різному обрізаються на 255.
+
+Кадри незалежні один від одного: усі випадкові параметри кожного кадру
+фіксуються в розкладі до початку рендеру, тож ``render_gif`` може збирати
+і квантувати кадри в пулі потоків, а результат побайтно однаковий за
+будь-якої кількості потоків.
+"""
+
+import io
+import os
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import GifImagePlugin, Image, ImageFilter
+
+# Версія рендеру й кодування: входить у ключ кешу анімацій, тож її треба
+# збільшувати при кожній зміні вихідних байтів (ефекти, палітра, кодери),
+# інакше дисковий кеш після оновлення віддаватиме старі файли
+ENGINE_VERSION = 1
+FRAME_COUNT = 25  # ~3 секунди при 8 FPS
+FRAME_DURATION_MS = 120  # 120ms = ~8 FPS
+
+# Ключові слова промпту для кожного типу руху
+EFFECT_KEYWORDS = {
+    "hair": ['волосся', 'hair', 'коса', 'локони'],
+    "clothes": ['одяг', 'clothes', 'сукня', 'рубашка', 'куртка'],
+    "water": ['вода', 'water', 'море', 'річка', 'дощ'],
+    "fire": ['вогонь', 'fire', 'полум\'я', 'свічка'],
+    "eyes": ['очі', 'eyes', 'погляд', 'моргання'],
+    "smoke": ['дим', 'smoke', 'пара', 'туман'],
+}
+
+SMOKE_COLOR = 200
+EYE_BLINK_GAIN = 0.7
+FIRE_SATURATION = 1.1
+WATER_BLUR_RADIUS = 0.5
+PREVIEW_MAX_EDGE = 512  # довша сторона швидкого превʼю
+PALETTE_SAMPLE_SIZE = 256  # довша сторона зразка для побудови палітри
+TRANSPARENT_INDEX = 255  # індекс палітри GIF для незмінних пікселів дельта-кадрів
+WEBP_QUALITY = 80
+WEBP_METHOD = 4  # 0 — найшвидше, 6 — найменший файл
+OUTPUT_FORMATS = {  # формат -> MIME тип
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "apng": "image/png",
+}
+
+
+def detect_effects(prompt):
+    """Визначає набір ефектів за ключовими словами промпту"""
+    prompt_lower = prompt.lower()
+    return frozenset(
+        name for name, words in EFFECT_KEYWORDS.items()
+        if any(word in prompt_lower for word in words)
+    )
+
+
+def fit_image(image, max_edge):
+    """Зменшує зображення так, щоб довша сторона не перевищувала max_edge"""
+    if not max_edge or max(image.size) <= max_edge:
+        return image
+    scale = max_edge / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def open_scaled(data, max_edge):
+    """Відкриває зображення з байтів одразу зменшеним
+
+    Для JPEG ``draft`` дозволяє декодеру пропустити зайві пікселі
+    (DCT масштабування), тож превʼю 12 Мп фото декодується в рази швидше.
+    """
+    image = Image.open(io.BytesIO(data))
+    if max_edge:
+        image.draft("RGB", (max_edge, max_edge))
+    return fit_image(image, max_edge)
+
+
+def image_to_array(image):
+    """Декодує PIL зображення в масив RGB uint8 (H, W, 3)"""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image, dtype=np.uint8)
+
+
+def build_schedule(effects, width, height, frame_count=FRAME_COUNT, rng=None):
+    """Обчислює параметри всіх кадрів наперед
+
+    Випадкові числа витягуються в тому ж порядку, що й у старому циклі,
+    тож з однаковим ``rng`` розклад збігається з ``render_frames_reference``.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    i = np.arange(frame_count)
+    no_shift = np.zeros(frame_count, dtype=np.int64)
+
+    hair_offset = (np.sin(i * 0.3) * 2).astype(np.int64) if "hair" in effects else no_shift
+    clothes_offset = (np.sin(i * 0.25) * 1.5).astype(np.int64) if "clothes" in effects else no_shift
+
+    water_gain = 1.0 + np.sin(i * 0.5) * 0.05 if "water" in effects else np.ones(frame_count)
+    blur = (i % 3 == 0) if "water" in effects else np.zeros(frame_count, dtype=bool)
+
+    flicker = np.ones(frame_count)
+    tremor = np.zeros((frame_count, 2), dtype=np.int64)
+    for frame in range(frame_count):
+        if "fire" in effects:
+            flicker[frame] = 1.0 + np.sin(frame * 0.8) * 0.1 + rng.normal(0, 0.02)
+        global_tremor = rng.normal(0, 0.3)
+        if abs(global_tremor) > 0.1:
+            tremor[frame] = (int(global_tremor), int(rng.normal(0, 0.2)))
+
+    saturation = np.full(frame_count, FIRE_SATURATION if "fire" in effects else 1.0)
+    eye_gain = np.where(i % 12 == 0, EYE_BLINK_GAIN, 1.0) if "eyes" in effects else np.ones(frame_count)
+
+    # Альфа-рампа диму: смуги по 11 рядків кожні 20 пікселів
+    if "smoke" in effects:
+        rows = np.arange(height)
+        band_alpha = (30 * np.sin(np.arange(0, height, 20)[None, :] * 0.1 + i[:, None] * 0.5)).astype(np.int64)
+        smoke_alpha = np.clip(band_alpha, 0, None)[:, rows // 20] * (rows % 20 <= 10)
+    else:
+        smoke_alpha = np.zeros((frame_count, height), dtype=np.int64)
+
+    return {
+        "frame_count": frame_count,
+        "width": width,
+        "height": height,
+        "hair_offset": hair_offset,
+        "clothes_offset": clothes_offset,
+        "water_gain": water_gain,
+        "flicker": flicker,
+        "blur": blur,
+        "saturation": saturation,
+        "eye_gain": eye_gain,
+        "smoke_alpha": smoke_alpha.astype(np.uint16),
+        "tremor": tremor,
+    }
+
+
+def _shift_band(dst, src, top, bottom, offset, filled=None):
+    """Зсуває горизонтальну смугу рядків на offset пікселів з чорним заповненням"""
+    width = src.shape[1]
+    end = bottom if filled is None else min(bottom, top + filled)
+    if abs(offset) >= width:
+        dst[top:bottom] = 0
+        return
+    if offset > 0:
+        dst[top:end, :width - offset] = src[top:end, offset:]
+        dst[top:end, width - offset:] = 0
+    else:
+        dst[top:end, -offset:] = src[top:end, :width + offset]
+        dst[top:end, :-offset] = 0
+    dst[end:bottom] = 0
+
+
+def _shift_frame(frame, dx, dy):
+    """Зсуває весь кадр на (dx, dy) з чорним заповненням"""
+    height, width = frame.shape[:2]
+    out = np.zeros_like(frame)
+    if abs(dx) >= width or abs(dy) >= height:
+        return out
+    out[max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)] = \
+        frame[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)]
+    return out
+
+
+def _blur(base):
+    """Розмиває базовий масив один раз для всіх кадрів з ефектом води"""
+    blurred = Image.fromarray(base).filter(ImageFilter.GaussianBlur(WATER_BLUR_RADIUS))
+    return np.asarray(blurred)
+
+
+def _gain_lut(gain):
+    """Таблиця яскравості як у ImageEnhance.Brightness (з відкиданням дробу)"""
+    return np.clip(np.arange(256) * gain, 0, 255).astype(np.uint8)
+
+
+def _enhance(frame, gain_lut, saturation):
+    """Яскравість (таблиця) і насиченість як у ImageEnhance за один прохід PIL
+
+    ``Image.point`` і ``Image.blend`` з сірою копією — це саме те, що роблять
+    ``ImageEnhance.Brightness`` і ``ImageEnhance.Color``, але без проміжних
+    int16 масивів: на 12 Мп кадрі крок удвічі швидший, ніж індексація таблиці
+    й цілочисельна насиченість у NumPy. Результат лише для читання.
+    """
+    image = Image.fromarray(frame)
+    if gain_lut is not None:
+        image = image.point(gain_lut.tolist() * 3)
+    if saturation != 1.0:
+        image = Image.blend(image.convert("L").convert("RGB"), image, saturation)
+    return np.asarray(image)
+
+
+def render_frame(base, schedule, i, blurred=None):
+    """Збирає i-й кадр з базового масиву за розкладом
+
+    ``blurred`` — заздалегідь розмитий ``base`` для кадрів з розмиттям води.
+    Розмиття лінійне, тож його можна виконати до зсувів і зміни яскравості.
+    """
+    if schedule["blur"][i]:
+        if blurred is None:
+            blurred = _blur(base)
+        base = blurred
+    height, width = base.shape[:2]
+    third = height // 3
+    frame = base
+
+    # Рух волосся (верхня третина) та одягу (середня третина)
+    hair = int(schedule["hair_offset"][i])
+    clothes = int(schedule["clothes_offset"][i])
+    if hair or clothes:
+        frame = base.copy()
+        if hair:
+            _shift_band(frame, base, 0, third, hair)
+        if clothes:
+            _shift_band(frame, base, third, 2 * height // 3, clothes, filled=third)
+
+    # Вода, вогонь: яскравість (одна складена таблиця) та насиченість
+    gain_lut = None
+    for gain in (schedule["water_gain"][i], schedule["flicker"][i]):
+        if gain != 1.0:
+            lut = _gain_lut(gain)
+            gain_lut = lut if gain_lut is None else lut[gain_lut]
+    saturation = schedule["saturation"][i]
+    if gain_lut is not None or saturation != 1.0:
+        frame = _enhance(frame, gain_lut, saturation)
+
+    # Моргання: затемнення центральної області
+    eye_gain = schedule["eye_gain"][i]
+    if eye_gain != 1.0:
+        if frame is base or not frame.flags.writeable:
+            frame = frame.copy()
+        region = (slice(height // 4, 2 * height // 3), slice(width // 4, 3 * width // 4))
+        frame[region] = _gain_lut(eye_gain)[frame[region]]
+
+    # Дим: напівпрозорі сірі смуги (альфа-композиція на непрозорий кадр)
+    alpha = schedule["smoke_alpha"][i]
+    rows = np.flatnonzero(alpha)
+    if rows.size:
+        if frame is base or not frame.flags.writeable:
+            frame = frame.copy()
+        a = alpha[rows][:, None, None]
+        blended = frame[rows].astype(np.uint16) * (255 - a) + SMOKE_COLOR * a + 127
+        frame[rows] = (blended // 255).astype(np.uint8)
+
+    # Загальне тремтіння для живості
+    dx, dy = (int(v) for v in schedule["tremor"][i])
+    if dx or dy:
+        frame = _shift_frame(frame, dx, dy)
+
+    return frame
+
+
+def iter_frames(image, effects, frame_count=FRAME_COUNT, rng=None):
+    """Генерує кадри демо анімації по одному як масиви uint8
+
+    Одночасно в пам'яті лише базовий масив, його розмита копія (для води)
+    і поточний кадр — незалежно від кількості кадрів.
+    """
+    base = image if isinstance(image, np.ndarray) else image_to_array(image)
+    height, width = base.shape[:2]
+    schedule = build_schedule(effects, width, height, frame_count, rng)
+    blurred = _blur(base) if schedule["blur"].any() else None
+    for i in range(frame_count):
+        yield render_frame(base, schedule, i, blurred)
+
+
+def _map_ordered(fn, count, executor=None, lookahead=1):
+    """Повертає ``fn(0) .. fn(count - 1)`` по порядку, виконуючи їх в ``executor``
+
+    Наперед рахується не більше ``lookahead`` кадрів, тож пам'ять не
+    залежить від кількості кадрів. Без ``executor`` — послідовно.
+    """
+    if executor is None:
+        for i in range(count):
+            yield fn(i)
+        return
+    pending = deque()
+    for i in range(count):
+        pending.append(executor.submit(fn, i))
+        if len(pending) >= lookahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def default_render_workers(job_workers=1):
+    """Потоків рендеру на задачу: ядра, поділені між ``job_workers`` задачами"""
+    return max(1, (os.cpu_count() or 1) // max(1, job_workers))
+
+
+def _render_pool(workers):
+    """Пул потоків рендеру або None для послідовного рендеру"""
+    if workers <= 1:
+        return None
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+
+
+def render_frames(image, effects, frame_count=FRAME_COUNT, rng=None):
+    """Рендерить усі кадри демо анімації як масиви uint8"""
+    return list(iter_frames(image, effects, frame_count, rng))
+
+
+def encode_gif(frames, duration=FRAME_DURATION_MS):
+    """Кодує кадри (масиви або PIL) в анімований GIF"""
+    images = [Image.fromarray(f) if isinstance(f, np.ndarray) else f for f in frames]
+    output = io.BytesIO()
+    images[0].save(output, format='GIF',
+                   save_all=True, append_images=images[1:],
+                   duration=duration,
+                   loop=0)
+    return output.getvalue()
+
+
+def build_palette(base, sample_size=PALETTE_SAMPLE_SIZE):
+    """Обчислює одну спільну палітру для всіх кадрів до початку рендеру
+
+    Палітра будується зі зменшеної копії базового зображення (кадри — його
+    варіації); чорний колір заповнення зсувів і колір диму додаються окремо,
+    останній індекс (``TRANSPARENT_INDEX``) зарезервовано під прозорість.
+    """
+    sample = Image.fromarray(base) if isinstance(base, np.ndarray) else base.convert("RGB")
+    sample = sample.copy()
+    sample.thumbnail((sample_size, sample_size))
+    colors = sample.quantize(253).getpalette()[:253 * 3]
+    colors += [0, 0, 0] * (253 - len(colors) // 3)
+    colors += [0, 0, 0] + [SMOKE_COLOR] * 3 + [0, 0, 0]
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(colors)
+    return palette
+
+
+class PreparedImage:
+    """Декодований базовий масив зображення з палітрою і розмитою копією
+
+    Палітра і розмиття для води рахуються при першому зверненні і далі
+    перевикористовуються: повторний рендер того самого зображення з іншим
+    seed, промптом чи форматом не декодує і не розмиває його знову.
+    """
+
+    def __init__(self, image):
+        self.base = image if isinstance(image, np.ndarray) else image_to_array(image)
+        self._palette = None
+        self._blurred = None
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.base.nbytes + (self._blurred.nbytes if self._blurred is not None else 0)
+
+    @property
+    def palette(self):
+        with self._lock:
+            if self._palette is None:
+                self._palette = build_palette(self.base)
+            return self._palette
+
+    @property
+    def blurred(self):
+        with self._lock:
+            if self._blurred is None:
+                self._blurred = _blur(self.base)
+            return self._blurred
+
+
+class GifStreamWriter:
+    """Інкрементальний GIF кодувальник зі спільною палітрою
+
+    Заголовок і глобальна палітра пишуться одразу, кожен кадр квантується
+    і стискається LZW в момент надходження, тож кадри не накопичуються.
+
+    З ``delta=True`` (за замовчуванням) кожен кадр після першого пишеться
+    лише прямокутником, у якому він відрізняється від попереднього, з
+    disposal 1 (попередній кадр лишається під новим); незмінні пікселі
+    всередині прямокутника стають прозорими, що дає довгі серії одного
+    індексу і краще LZW стиснення.
+    """
+
+    def __init__(self, fp, palette, size, duration=FRAME_DURATION_MS, loop=0, delta=True):
+        self.fp = fp
+        self.palette = palette
+        self.size = size
+        self.duration = duration
+        self.delta = delta
+        self.frame_count = 0
+        self._previous = None
+        palette.load()  # палітру читають потоки кодування, завантажуємо заздалегідь
+        width, height = size
+        fp.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, 0, 0))
+        fp.write(bytes(palette.getpalette()[:256 * 3]))
+        # NETSCAPE2.0: кількість повторів (0 — нескінченно)
+        fp.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    def quantize(self, frame):
+        """Індекси спільної палітри для кадру (H, W) uint8; можна з будь-якого потоку"""
+        image = Image.fromarray(frame) if isinstance(frame, np.ndarray) else frame.convert("RGB")
+        indices = np.asarray(image.quantize(palette=self.palette, dither=Image.Dither.NONE))
+        if self.delta:
+            # Зарезервований індекс має колір чорного; нічия в пошуку найближчого
+            # кольору не повинна зробити піксель прозорим
+            indices = np.where(indices == TRANSPARENT_INDEX, TRANSPARENT_INDEX - 2, indices)
+        return indices
+
+    def encode_indices(self, indices, previous=None):
+        """Стискає кадр (дельту відносно ``previous``); можна з будь-якого потоку"""
+        params = {"duration": self.duration}
+        offset = (0, 0)
+        if self.delta:
+            params["disposal"] = 1
+        if self.delta and previous is not None:
+            changed = indices != previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            if rows.size:
+                cols = np.flatnonzero(changed.any(axis=0))
+                top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+                indices = np.where(changed[top:bottom, left:right],
+                                   indices[top:bottom, left:right], TRANSPARENT_INDEX).astype(np.uint8)
+                offset = (int(left), int(top))
+            else:
+                # Кадр не змінився: один прозорий піксель зберігає його тривалість
+                indices = np.full((1, 1), TRANSPARENT_INDEX, np.uint8)
+            params["transparency"] = TRANSPARENT_INDEX
+        height, width = indices.shape
+        image = Image.frombytes("P", (width, height), np.ascontiguousarray(indices).tobytes())
+        return b"".join(GifImagePlugin.getdata(image, offset, **params))
+
+    def encode(self, frame, previous=None):
+        """Квантує і стискає кадр; можна з будь-якого потоку"""
+        return self.encode_indices(self.quantize(frame), previous)
+
+    def write_encoded(self, data):
+        """Дописує в потік кадр, підготовлений ``encode``/``encode_indices``"""
+        self.fp.write(data)
+        self.frame_count += 1
+
+    def write(self, frame):
+        """Квантує кадр до спільної палітри і дописує його в потік"""
+        indices = self.quantize(frame)
+        self.write_encoded(self.encode_indices(indices, self._previous))
+        self._previous = indices
+
+    def close(self):
+        """Завершує GIF потік"""
+        self.fp.write(b";")
+
+
+def encode_gif_stream(frames, palette, size, duration=FRAME_DURATION_MS, delta=True):
+    """Кодує ітератор кадрів у GIF, тримаючи в пам'яті лише один кадр"""
+    output = io.BytesIO()
+    writer = GifStreamWriter(output, palette, size, duration, delta=delta)
+    for frame in frames:
+        writer.write(frame)
+    writer.close()
+    return output.getvalue()
+
+
+def encode_webp(frames, duration=FRAME_DURATION_MS, quality=WEBP_QUALITY, method=WEBP_METHOD):
+    """Кодує кадри в анімований WebP (повнокольоровий, з міжкадровою оптимізацією libwebp)
+
+    Pillow приймає для анімації лише список, тож усі кадри тримаються в пам'яті.
+    """
+    images = [Image.fromarray(f) if isinstance(f, np.ndarray) else f for f in frames]
+    output = io.BytesIO()
+    images[0].save(output, format="WEBP", save_all=True, append_images=images[1:],
+                   duration=duration, loop=0, quality=quality, method=method)
+    return output.getvalue()
+
+
+def encode_apng(frames, duration=FRAME_DURATION_MS):
+    """Кодує кадри в APNG (без втрат); Pillow сам пише лише змінені прямокутники
+
+    Як і для WebP, усі кадри тримаються в пам'яті.
+    """
+    images = [Image.fromarray(f) if isinstance(f, np.ndarray) else f for f in frames]
+    output = io.BytesIO()
+    images[0].save(output, format="PNG", save_all=True, append_images=images[1:],
+                   duration=duration, loop=0, disposal=0, blend=0, compress_level=6)
+    return output.getvalue()
+
+
+def render_gif(image, effects, palette, frame_count=FRAME_COUNT, rng=None, workers=1,
+               duration=FRAME_DURATION_MS, delta=True):
+    """Рендерить і кодує демо GIF; кадри обробляються в ``workers`` потоках
+
+    Розклад будується з ``rng`` до запуску потоків, тож кожен кадр має
+    власні фіксовані параметри і результат не залежить від ``workers``.
+    Рендер і квантування кадрів, а потім LZW стиснення дельт ідуть у пулі;
+    у потік кадри дописуються по порядку.
+    """
+    prepared = image if isinstance(image, PreparedImage) else PreparedImage(image)
+    base = prepared.base
+    height, width = base.shape[:2]
+    schedule = build_schedule(effects, width, height, frame_count, rng)
+    blurred = prepared.blurred if schedule["blur"].any() else None
+
+    output = io.BytesIO()
+    writer = GifStreamWriter(output, palette, (width, height), duration, delta=delta)
+    executor = _render_pool(workers)
+    # Кадр у роботі тримає кілька повнорозмірних uint8 копій (зсунуті смуги,
+    # проміжні зображення PIL яскравості й насиченості, тремтіння), тож
+    # наперед рахується не більше кадрів, ніж потоків
+    lookahead = max(1, workers)
+    try:
+        indexed = _map_ordered(
+            lambda i: writer.quantize(render_frame(base, schedule, i, blurred)),
+            frame_count, executor, lookahead,
+        )
+        pending = deque()
+        previous = None
+        for indices in indexed:
+            if executor is None:
+                writer.write_encoded(writer.encode_indices(indices, previous))
+            else:
+                pending.append(executor.submit(writer.encode_indices, indices, previous))
+                if len(pending) >= lookahead:
+                    writer.write_encoded(pending.popleft().result())
+            previous = indices
+        while pending:
+            writer.write_encoded(pending.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    writer.close()
+    return output.getvalue()
+
+
+def render_animation(image, effects, output_format="gif", palette=None, frame_count=FRAME_COUNT,
+                     rng=None, workers=1, duration=FRAME_DURATION_MS):
+    """Рендерить демо анімацію у форматі з ``OUTPUT_FORMATS``
+
+    ``image`` — PIL зображення, масив або ``PreparedImage`` (тоді його
+    палітра і розмита копія перевикористовуються). GIF кодується потоково
+    (``render_gif``); WebP і APNG потребують усіх кадрів одразу, тож кадри
+    рендеряться в пулі і збираються в список.
+    """
+    prepared = image if isinstance(image, PreparedImage) else PreparedImage(image)
+    if output_format == "gif":
+        return render_gif(prepared, effects, palette if palette is not None else prepared.palette,
+                          frame_count, rng, workers, duration)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"невідомий формат анімації: {output_format}")
+    base = prepared.base
+    height, width = base.shape[:2]
+    schedule = build_schedule(effects, width, height, frame_count, rng)
+    blurred = prepared.blurred if schedule["blur"].any() else None
+    executor = _render_pool(workers)
+    try:
+        frames = list(_map_ordered(lambda i: render_frame(base, schedule, i, blurred),
+                                   frame_count, executor, max(1, workers)))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    encode = encode_webp if output_format == "webp" else encode_apng
+    return encode(frames, duration)
+
+
+def render_frames_reference(image, effects, frame_count=FRAME_COUNT, rng=None):
+    """Старий покадровий PIL-рендер, еталон для перевірки точності та швидкості"""
+    from PIL import ImageEnhance, ImageDraw
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    frames = []
+    for i in range(frame_count):
+        frame = image.copy()
+        width, height = frame.size
+
+        if "hair" in effects:
+            offset = int(np.sin(i * 0.3) * 2)
+            top_region = frame.crop((0, 0, width, height // 3))
+            if offset != 0:
+                shifted = Image.new('RGB', top_region.size, (0, 0, 0))
+                if offset > 0:
+                    shifted.paste(top_region.crop((offset, 0, width, height // 3)), (0, 0))
+                else:
+                    shifted.paste(top_region.crop((0, 0, width + offset, height // 3)), (-offset, 0))
+                frame.paste(shifted, (0, 0))
+
+        if "clothes" in effects:
+            offset = int(np.sin(i * 0.25) * 1.5)
+            mid_region = frame.crop((0, height // 3, width, 2 * height // 3))
+            if offset != 0:
+                shifted = Image.new('RGB', mid_region.size, (0, 0, 0))
+                if offset > 0:
+                    shifted.paste(mid_region.crop((offset, 0, width, height // 3)), (0, 0))
+                else:
+                    shifted.paste(mid_region.crop((0, 0, width + offset, height // 3)), (-offset, 0))
+                frame.paste(shifted, (0, height // 3))
+
+        if "water" in effects:
+            frame = ImageEnhance.Brightness(frame).enhance(1.0 + np.sin(i * 0.5) * 0.05)
+            if i % 3 == 0:
+                frame = frame.filter(ImageFilter.GaussianBlur(WATER_BLUR_RADIUS))
+
+        if "fire" in effects:
+            flicker = 1.0 + np.sin(i * 0.8) * 0.1 + rng.normal(0, 0.02)
+            frame = ImageEnhance.Brightness(frame).enhance(flicker)
+            frame = ImageEnhance.Color(frame).enhance(FIRE_SATURATION)
+
+        if "eyes" in effects and i % 12 == 0:
+            eye_region = frame.crop((width // 4, height // 4, 3 * width // 4, 2 * height // 3))
+            darkened = ImageEnhance.Brightness(eye_region).enhance(EYE_BLINK_GAIN)
+            frame.paste(darkened, (width // 4, height // 4))
+
+        if "smoke" in effects:
+            overlay = Image.new('RGBA', frame.size, (255, 255, 255, 0))
+            draw = ImageDraw.Draw(overlay)
+            for y in range(0, height, 20):
+                alpha = int(30 * np.sin(y * 0.1 + i * 0.5))
+                if alpha > 0:
+                    draw.rectangle([0, y, width, y + 10], fill=(SMOKE_COLOR,) * 3 + (alpha,))
+            frame = Image.alpha_composite(frame.convert('RGBA'), overlay).convert('RGB')
+
+        global_tremor = rng.normal(0, 0.3)
+        if abs(global_tremor) > 0.1:
+            offset_x = int(global_tremor)
+            offset_y = int(rng.normal(0, 0.2))
+            shifted = Image.new('RGB', frame.size, (0, 0, 0))
+            crop_x = max(0, -offset_x)
+            crop_y = max(0, -offset_y)
+            cropped = frame.crop((crop_x, crop_y, frame.width + crop_x, frame.height + crop_y))
+            shifted.paste(cropped, (max(0, offset_x), max(0, offset_y)))
+            frame = shifted
+
+        frames.append(frame)
+
+    return frames
@@ -0,0 +1,130 @@
+"""Обʼєднання однакових професійних генерацій і кеш їхніх результатів.
+
+Однаковий запит — ті самі байти зображення, промпт, тривалість і параметри
+моделі — не повинен запускати ще одну платну генерацію:
+
+* single-flight: поки генерація триває, ідентичні запити не стартують
+  нових, а чекають на неї і отримують той самий результат (або ту саму
+  помилку);
+* кеш результатів: успішний результат (URL відео і дані провайдера)
+  зберігається за ключем на ``ttl`` секунд. TTL коротший за час життя
+  файлів у провайдерів (Replicate видаляє результати API генерацій через
+  годину), тож збережений URL ще відкривається.
+
+Невдалі генерації не кешуються. Один екземпляр на процес.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 50 * 60  # секунд; файли Replicate живуть годину
+DEFAULT_MAX_ENTRIES = 500
+
+HIT = "hit"  # результат з кешу
+COALESCED = "coalesced"  # приєдналися до ідентичної генерації, що вже йшла
+MISS = "miss"  # запущено нову генерацію
+
+
+def generation_key(image_bytes, prompt, **params):
+    """Ключ запиту: хеш зображення + промпт + параметри провайдера"""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_bytes).digest())
+    digest.update(json.dumps([prompt.strip(), params], sort_keys=True, ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+class _Flight:
+    """Генерація, що триває, і її результат для всіх, хто чекає"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class GenerationCache:
+    """Потокобезпечний single-flight з TTL кешем результатів"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # ключ -> (час збереження, запис)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {HIT: 0, COALESCED: 0, MISS: 0, "failures": 0, "expired": 0}
+
+    def get(self, key):
+        """Збережений запис або None, якщо його немає чи TTL минув"""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key):
+        # Викликається під self._lock
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        stored, entry = item
+        if self.clock() - stored > self.ttl:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = (self.clock(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_generate(self, key, generate, on_wait=None):
+        """Повертає ``(запис, джерело)``, де джерело — ``hit``, ``coalesced`` або ``miss``
+
+        ``generate()`` повертає запис (словник) або піднімає виняток; його
+        викликає лише перший з ідентичних запитів. ``on_wait()`` викликається
+        перед очікуванням чужої генерації.
+        """
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                self.stats[HIT] += 1
+                return entry, HIT
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats[MISS] += 1
+            else:
+                self.stats[COALESCED] += 1
+
+        if not leader:
+            if on_wait:
+                on_wait()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry, COALESCED
+
+        try:
+            flight.entry = generate()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.stats["failures"] += 1
+            raise
+        else:
+            self.put(key, flight.entry)
+            return flight.entry, MISS
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
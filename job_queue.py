@@ -0,0 +1,203 @@
+"""Фонова черга задач оживлення, спільна для всіх сесій.
+
+Задачі виконуються в обмеженому пулі потоків поза запуском сценарію
+Streamlit, тож перезапуск сторінки (``st.rerun``, зміна віджета) не губить
+генерацію, що триває: сесія зберігає лише ідентифікатори своїх задач і
+щоразу читає їхній стан з черги.
+
+Прийом обмежений: у черзі загалом чекає не більше ``max_queued`` задач, а
+одна сесія має не більше ``max_per_session`` незавершених задач; понад це
+``submit`` піднімає ``QueueFull``, і пул не можна забити сплеском запитів.
+
+Завершені задачі тримають результати (байти анімацій, превʼю) у пам'яті
+процесу, доки сесія їх не прибере. Щоб покинуті сесії не накопичували їх,
+черга забуває найстаріші завершені задачі понад ``max_finished`` штук,
+понад ``max_finished_bytes`` байтів результатів або старші за
+``finished_ttl`` секунд.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELED = "canceled"
+
+DEFAULT_FINISHED_BYTES = 256 * 1024 * 1024
+DEFAULT_FINISHED_TTL = 1800.0  # 30 хвилин
+
+
+def payload_bytes(*mappings):
+    """Скільки байтів займають значення ``bytes`` у словниках результату й деталей"""
+    return sum(len(value) for mapping in mappings if isinstance(mapping, dict)
+               for value in mapping.values() if isinstance(value, (bytes, bytearray)))
+
+
+class QueueFull(Exception):
+    """Задачу не прийнято: черга або ліміт сесії заповнені"""
+
+
+class Job:
+    """Стан однієї задачі; оновлюється з потоку виконавця"""
+
+    def __init__(self, session_id, label, fn, trace=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.label = label
+        self.trace = trace
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.details = {}  # проміжні дані для інтерфейсу (превʼю, таймінги провайдерів)
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.nbytes = 0  # байти результату й деталей, рахуються при завершенні
+        self._fn = fn
+        self._future = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def seconds(self):
+        """Час виконання (без очікування в черзі)"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def queued_seconds(self):
+        """Час очікування в черзі; для скасованої до запуску — до скасування"""
+        return (self.started or self.finished or time.time()) - self.created
+
+    def update(self, progress=None, message=None, **details):
+        """Звіт про прогрес з функції задачі"""
+        with self._lock:
+            if progress is not None:
+                self.progress = min(max(progress, 0.0), 1.0)
+            if message is not None:
+                self.message = message
+            self.details.update(details)
+
+
+class JobQueue:
+    """Обмежений пул виконавців з контролем прийому задач"""
+
+    def __init__(self, workers=4, max_queued=32, max_per_session=8, max_finished=200,
+                 max_finished_bytes=DEFAULT_FINISHED_BYTES, finished_ttl=DEFAULT_FINISHED_TTL):
+        self.max_queued = max_queued
+        self.max_per_session = max_per_session
+        self.max_finished = max_finished
+        self.max_finished_bytes = max_finished_bytes  # None — без обмеження
+        self.finished_ttl = finished_ttl  # None — без обмеження
+        self._jobs = {}  # id -> Job у порядку додавання
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, session_id, label, fn, trace=None):
+        """Ставить ``fn(job)`` у чергу; результат функції стає ``job.result``"""
+        job = Job(session_id, label, fn, trace)
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if queued >= self.max_queued:
+                raise QueueFull(f"черга заповнена ({queued} задач очікують), спробуйте пізніше")
+            mine = sum(1 for j in self._jobs.values() if j.session_id == session_id and j.active)
+            if mine >= self.max_per_session:
+                raise QueueFull(f"не більше {self.max_per_session} незавершених задач на сесію")
+            self._jobs[job.id] = job
+            self._prune()
+            job._future = self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started = time.time()
+        if job.trace is not None:
+            job.trace.start()
+        try:
+            job.result = job._fn(job)
+            job.progress = 1.0
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = FAILED
+        finally:
+            job.nbytes = payload_bytes(job.result, job.details)
+            job.finished = time.time()
+            if job.trace is not None:
+                job.trace.finish("ok" if job.status == DONE else "error", label=job.label)
+            with self._lock:
+                self._prune()
+
+    def _prune(self):
+        # Викликається під self._lock: найстаріші завершені задачі забуваються
+        # понад ліміт кількості чи байтів, а прострочені — завжди
+        # (``finished`` ставиться останнім, тож задачу, що ще дописує результат, не чіпаємо)
+        finished = [j for j in self._jobs.values() if not j.active and j.finished is not None]
+        excess = len(finished) - self.max_finished
+        total = sum(j.nbytes for j in finished)
+        now = time.time()
+        for job in finished:
+            expired = self.finished_ttl is not None and now - job.finished > self.finished_ttl
+            too_big = self.max_finished_bytes is not None and total > self.max_finished_bytes
+            if not (excess > 0 or too_big or expired):
+                continue
+            del self._jobs[job.id]
+            excess -= 1
+            total -= job.nbytes
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, job_ids):
+        """Задачі, що ще відомі черзі, у порядку ``job_ids``"""
+        with self._lock:
+            self._prune()
+            return [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+
+    def position(self, job):
+        """Позиція задачі в черзі (1 — наступна), 0 якщо вона вже не чекає"""
+        with self._lock:
+            if job.status != QUEUED:
+                return 0
+            queued = [j for j in self._jobs.values() if j.status == QUEUED]
+        return queued.index(job) + 1
+
+    def cancel(self, job_id):
+        """Скасовує задачу, що ще чекає в черзі; запущені доробляються"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            job.status = CANCELED
+            job.finished = time.time()
+        job._future.cancel()
+        return True
+
+    def forget(self, job_ids):
+        """Прибирає завершені задачі (разом з їхніми результатами)"""
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None and not job.active:
+                    del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
@@ -0,0 +1,170 @@
+"""Очікування завершення генерацій Replicate.
+
+Два механізми, що працюють разом:
+
+* адаптивне опитування — часті запити на початку, далі інтервал зростає;
+  поки модель лише стартує (``starting``), інтервал росте швидше, ніж під
+  час обробки (``processing``), коли результат вже близько;
+* вебхук — локальний HTTP приймач, на який Replicate надсилає завершену
+  генерацію. Очікування між опитуваннями тоді не ``sleep``, а чекання на
+  подію, тож результат зʼявляється одразу; опитування лишається страховкою
+  на випадок втраченого вебхука.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TERMINAL_STATUSES = frozenset({"succeeded", "failed", "canceled"})
+
+INITIAL_INTERVAL = 0.5
+BACKOFF_FACTOR = 1.5
+MAX_INTERVAL = {"starting": 5.0, "processing": 2.0}
+DEFAULT_MAX_INTERVAL = 5.0
+WEBHOOK_POLL_INTERVAL = 15.0  # страхувальне опитування при увімкненому вебхуку
+DEFAULT_TIMEOUT = 300.0  # 5 хвилин максимум
+
+
+def next_interval(interval, status):
+    """Наступний інтервал опитування з урахуванням звітного статусу генерації"""
+    state = (status or {}).get("status")
+    return min(interval * BACKOFF_FACTOR, MAX_INTERVAL.get(state, DEFAULT_MAX_INTERVAL))
+
+
+def wait_for_prediction(fetch_status, timeout=DEFAULT_TIMEOUT, on_progress=None, wait=None,
+                        min_interval=0.0, initial_interval=INITIAL_INTERVAL,
+                        clock=time.monotonic, sleep=time.sleep):
+    """Чекає на завершення генерації; повертає останній статус або None
+
+    ``fetch_status()`` повертає словник генерації (або None при помилці).
+    ``wait(seconds)`` замінює паузу між опитуваннями: повертає завершену
+    генерацію, якщо вона прийшла раніше (вебхук), інакше None.
+    ``min_interval`` — нижня межа паузи (з вебхуком опитування лише
+    страховка, тож ``WEBHOOK_POLL_INTERVAL``).
+    ``on_progress(elapsed, status)`` викликається після кожного опитування.
+    """
+    start = clock()
+    interval = initial_interval
+    status = None
+    while True:
+        latest = fetch_status()
+        if latest:
+            status = latest
+            if status.get("status") in TERMINAL_STATUSES:
+                return status
+
+        elapsed = clock() - start
+        if on_progress:
+            on_progress(elapsed, status)
+        remaining = timeout - elapsed
+        if remaining <= 0:
+            return status
+
+        pause = min(max(interval, min_interval), remaining)
+        if wait is None:
+            sleep(pause)
+        else:
+            pushed = wait(pause)
+            if pushed and pushed.get("status") in TERMINAL_STATUSES:
+                return pushed
+        interval = next_interval(interval, status)
+
+
+def verify_signature(secret, headers, body, tolerance=300, now=None):
+    """Перевіряє підпис вебхука Replicate (webhook-id/-timestamp/-signature)"""
+    webhook_id = headers.get("webhook-id", "")
+    timestamp = headers.get("webhook-timestamp", "")
+    signatures = headers.get("webhook-signature", "")
+    if not (webhook_id and timestamp.isdigit() and signatures):
+        return False
+    if abs((now or time.time()) - int(timestamp)) > tolerance:
+        return False
+    key = base64.b64decode(secret.split("_", 1)[1] if secret.startswith("whsec_") else secret)
+    signed = f"{webhook_id}.{timestamp}.".encode() + body
+    expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+    return any(
+        hmac.compare_digest(expected, sig.split(",", 1)[-1])
+        for sig in signatures.split()
+    )
+
+
+class WebhookReceiver:
+    """Локальний HTTP приймач вебхуків Replicate про завершені генерації
+
+    Без секрету підпису будь-хто міг би підкласти "завершену" генерацію з
+    довільним ``output``, і сервер завантажив би цей URL, тож приймач без
+    секрету не запускається. За замовчуванням слухає лише ``127.0.0.1`` —
+    назовні його відкриває зворотний проксі з ``REPLICATE_WEBHOOK_URL``.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, secret=None, max_entries=1000):
+        if not secret:
+            raise ValueError("Приймач вебхуків потребує REPLICATE_WEBHOOK_SECRET")
+        self.secret = secret
+        self.max_entries = max_entries
+        self._results = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                status = receiver._handle(self.headers, body)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def _handle(self, headers, body):
+        if not verify_signature(self.secret, headers, body):
+            return 401
+        try:
+            prediction = json.loads(body)
+            prediction_id = prediction["id"]
+        except (ValueError, KeyError, TypeError):
+            return 400
+        if prediction.get("status") in TERMINAL_STATUSES:
+            self.record(prediction_id, prediction)
+        return 200
+
+    def record(self, prediction_id, prediction):
+        """Зберігає завершену генерацію і будить тих, хто її чекає"""
+        with self._lock:
+            if len(self._results) >= self.max_entries:
+                self._results.pop(next(iter(self._results)))
+            self._results[prediction_id] = prediction
+            event = self._events.pop(prediction_id, None)
+        if event is not None:
+            event.set()
+
+    def wait(self, prediction_id, timeout):
+        """Чекає вебхук для генерації до ``timeout`` секунд; повертає її або None"""
+        with self._lock:
+            result = self._results.get(prediction_id)
+            if result is not None:
+                return result
+            event = self._events.setdefault(prediction_id, threading.Event())
+        event.wait(timeout)
+        # Подія живе лише поки її чекають, тож ``_events`` не росте
+        with self._lock:
+            if self._events.get(prediction_id) is event:
+                del self._events[prediction_id]
+            return self._results.get(prediction_id)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,140 @@
+"""Спільний HTTP клієнт для API провайдерів відео.
+
+Один ``requests.Session`` на провайдера з пулом keep-alive зʼєднань,
+таймаутами на зʼєднання і читання та обмеженими повторами з
+jitter-затримкою на 429/5xx. Заголовки авторизації будуються один раз при
+створенні клієнта. Екземпляри розраховані на спільне використання всіма
+сесіями процесу.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+DEFAULT_TIMEOUT = (3.05, 30)  # (зʼєднання, читання) секунд
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # базова затримка, подвоюється з кожною спробою
+MAX_BACKOFF = 10.0
+DEFAULT_POOL_SIZE = 16
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# POST створює платну генерацію, тож повторюємо лише коли запит точно
+# не оброблено: 429 і помилки встановлення зʼєднання
+POST_RETRY_STATUSES = frozenset({429})
+
+
+def not_sent(error):
+    """Чи впав запит ще до відправки (зʼєднання так і не встановлено)
+
+    Обірване вже після відправки тіла зʼєднання ("Connection aborted",
+    ``RemoteDisconnected``) теж є ``ConnectionError``, але запит міг бути
+    прийнятий, тож повтор POST створив би другу платну генерацію.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class ProviderClient:
+    """Пул HTTP зʼєднань до одного провайдера з таймаутами і повторами"""
+
+    def __init__(self, name, headers, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=DEFAULT_BACKOFF, pool_size=DEFAULT_POOL_SIZE):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    def _count(self, field):
+        with self._lock:
+            self.stats[field] += 1
+
+    def _delay(self, attempt, response=None):
+        """Затримка перед повтором: Retry-After або експонента з повним jitter"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), MAX_BACKOFF)
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        """Виконує запит з повторами; після вичерпання спроб повертає останню
+        відповідь або піднімає останній виняток ``requests``"""
+        kwargs.setdefault("timeout", self.timeout)
+        is_post = method.upper() == "POST"
+        retry_statuses = POST_RETRY_STATUSES if is_post else RETRY_STATUSES
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            self._count("requests")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._count("errors")
+                # POST повторюється, лише якщо запит точно не дійшов до сервера
+                retryable = not is_post or not_sent(e)
+                if last_attempt or not retryable:
+                    raise
+                delay = self._delay(attempt)
+            else:
+                if response.status_code not in retry_statuses or last_attempt:
+                    return response
+                self._count("errors")
+                delay = self._delay(attempt, response)
+                response.close()
+            self._count("retries")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def connection_stats(self):
+        """Статистика перевикористання зʼєднань з пулів urllib3"""
+        pools = []
+        # Один адаптер змонтовано для http і https — рахуємо його один раз
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            manager_pools = adapter.poolmanager.pools
+            pools.extend(manager_pools[key] for key in manager_pools.keys())
+        opened = sum(pool.num_connections for pool in pools)
+        served = sum(pool.num_requests for pool in pools)
+        return {
+            **self.stats,
+            "connections_opened": opened,
+            "connections_reused": max(0, served - opened),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def build_clients(secrets):
+    """Створює клієнти провайдерів; секрети читаються один раз
+
+    Content-Type не фіксується в сесії: ``json=`` і ``files=`` виставляють
+    його самі (інакше губиться межа multipart при завантаженні файлів).
+    """
+    return {
+        "replicate": ProviderClient("replicate", {
+            "Authorization": f"Bearer {secrets.get('REPLICATE_TOKEN', '')}",
+        }),
+        "segmind": ProviderClient("segmind", {
+            "x-api-key": secrets.get('SEGMIND_TOKEN', ''),
+        }),
+        # Готові відео з CDN провайдерів — без облікових даних
+        "cdn": ProviderClient("cdn", {}, timeout=(3.05, 60)),
+    }
@@ -0,0 +1,101 @@
+"""Паралельний запуск генерації у кількох провайдерів (хеджування).
+
+Провайдери запускаються в потоках у порядку пріоритету: перший одразу,
+кожен наступний — через ``hedge_delay`` секунд, якщо переможця ще немає,
+або одразу, якщо всі запущені вже впали. Перший успішний результат
+перемагає, решті виставляється подія скасування (Replicate при цьому
+скасовує генерацію, синхронні запити просто ігноруються).
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+TICK_SECONDS = 1.0  # як часто викликати on_progress під час очікування
+
+
+class ProviderError(Exception):
+    """Помилка провайдера з повідомленням для користувача"""
+
+
+def dispatch(runners, hedge_delay=0.0, timeout=None, on_progress=None, clock=time.monotonic):
+    """Запускає ``runners`` і повертає результат першого успішного
+
+    ``runners`` — список пар ``(назва, fn)``, де ``fn(cancel_event)``
+    повертає URL відео або піднімає виняток / повертає None при невдачі.
+    ``on_progress(elapsed, timings)`` викликається з потоку, що викликав
+    ``dispatch``, тож у ньому можна оновлювати інтерфейс.
+
+    Повертає словник ``{"video_url", "provider", "timings"}``, де
+    ``timings[назва] = {"status", "seconds", "error"}``; статуси:
+    ``won``, ``failed``, ``lost`` (скасовано після перемоги іншого),
+    ``running`` (не встиг до таймауту), ``skipped`` (не запускався).
+    """
+    start = clock()
+    queue = list(runners)
+    timings = {name: {"status": "skipped", "seconds": None, "error": None} for name, _ in runners}
+    cancel = threading.Event()
+    futures = {}
+    started_at = {}
+    result = {"video_url": None, "provider": None, "timings": timings}
+    if not runners:
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=max(1, len(runners)), thread_name_prefix="provider")
+
+    def launch():
+        name, fn = queue.pop(0)
+        started_at[name] = clock()
+        timings[name]["status"] = "running"
+        futures[executor.submit(fn, cancel)] = name
+
+    try:
+        launch()
+        next_launch = clock() + hedge_delay
+        while futures:
+            now = clock()
+            deadline = [TICK_SECONDS]
+            if queue:
+                deadline.append(max(0.0, next_launch - now))
+            if timeout is not None:
+                deadline.append(max(0.0, start + timeout - now))
+            done, _ = wait(list(futures), timeout=min(deadline), return_when=FIRST_COMPLETED)
+
+            # Розбираємо всі завершені: впалі мають лишитися failed, навіть якщо
+            # в тій самій пачці є переможець; інші успішні з пачки — lost
+            for future in done:
+                name = futures.pop(future)
+                timings[name]["seconds"] = clock() - started_at[name]
+                try:
+                    video_url = future.result()
+                except Exception as e:
+                    timings[name].update(status="failed", error=str(e) or type(e).__name__)
+                    continue
+                if not video_url:
+                    timings[name].update(status="failed", error="немає результату")
+                elif result["provider"]:
+                    timings[name]["status"] = "lost"
+                else:
+                    timings[name]["status"] = "won"
+                    result.update(video_url=video_url, provider=name)
+
+            now = clock()
+            if result["provider"] or (timeout is not None and now - start >= timeout):
+                break
+            # Наступний провайдер: за розкладом хеджування або коли всі запущені впали
+            if queue and (now >= next_launch or not futures):
+                launch()
+                next_launch = now + hedge_delay
+            if on_progress:
+                on_progress(now - start, timings)
+    finally:
+        cancel.set()
+        now = clock()
+        for name in futures.values():
+            timings[name].update(
+                status="lost" if result["provider"] else "running",
+                seconds=now - started_at[name],
+            )
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return result
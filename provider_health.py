@@ -0,0 +1,143 @@
+"""Маршрутизація генерацій з урахуванням швидкості та здоровʼя провайдерів.
+
+Для кожного провайдера зберігається ковзне вікно останніх результатів
+(час відправки, час до готового відео, успіх). Провайдери впорядковуються
+за очікуваним часом до результату з поправкою на частку помилок, а
+автоматичний вимикач (circuit breaker) тимчасово виключає провайдера, що
+поспіль повертає помилки. Стан спільний для всіх сесій процесу; час
+береться з ``clock``, тож оцінювання можна перевіряти на змодельованих
+таймінгах.
+"""
+
+import threading
+import time
+from collections import deque
+
+WINDOW_SIZE = 20
+FAILURE_THRESHOLD = 3  # помилок поспіль до розмикання
+COOLDOWN_SECONDS = 60.0  # скільки провайдер вимкнений до пробного запиту
+PRIOR_COMPLETION_SECONDS = 60.0  # оптимістична оцінка для провайдера без історії
+MIN_SUCCESS_RATE = 0.05
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """Ковзна статистика та стан вимикача одного провайдера"""
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.outcomes = deque(maxlen=window)  # (успіх, секунд до результату)
+        self.submits = deque(maxlen=window)  # секунд на відправку запиту
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+
+    def success_rate(self):
+        if not self.outcomes:
+            return 1.0
+        return sum(ok for ok, _ in self.outcomes) / len(self.outcomes)
+
+    def mean_completion(self):
+        times = [seconds for ok, seconds in self.outcomes if ok]
+        return sum(times) / len(times) if times else PRIOR_COMPLETION_SECONDS
+
+    def mean_submit(self):
+        return sum(self.submits) / len(self.submits) if self.submits else None
+
+    def score(self):
+        """Очікуваний час до успішного відео; менше — краще"""
+        return self.mean_completion() / max(self.success_rate(), MIN_SUCCESS_RATE)
+
+
+class ProviderRouter:
+    """Потокобезпечний маршрутизатор з ковзною статистикою і вимикачами"""
+
+    def __init__(self, window=WINDOW_SIZE, failure_threshold=FAILURE_THRESHOLD,
+                 cooldown=COOLDOWN_SECONDS, clock=time.monotonic):
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def _health(self, name):
+        # Викликається під self._lock
+        health = self._providers.get(name)
+        if health is None:
+            health = self._providers[name] = ProviderHealth(self.window)
+        return health
+
+    def _available(self, health):
+        # Викликається під self._lock; розімкнений вимикач після паузи
+        # пропускає один пробний запит (напіврозімкнений стан), а якщо його
+        # результат так і не надійшов — ще один через таку ж паузу
+        if health.state == CLOSED:
+            return True
+        if self.clock() - health.opened_at >= self.cooldown:
+            health.state = HALF_OPEN
+            health.opened_at = self.clock()
+            return True
+        return False
+
+    def rank(self, names):
+        """Доступні провайдери від найкращого до найгіршого
+
+        Порядок серед рівних зберігається, тож без історії діє пріоритет
+        з ``names``. Провайдери з розімкненим вимикачем пропускаються.
+        """
+        with self._lock:
+            available = [name for name in names if self._available(self._health(name))]
+            return sorted(available, key=lambda name: self._providers[name].score())
+
+    def order(self, runners):
+        """Впорядковує пари ``(назва, fn)`` для диспетчера за ``rank``"""
+        by_name = dict(runners)
+        return [(name, by_name[name]) for name in self.rank(list(by_name))]
+
+    def record_submit(self, name, seconds):
+        with self._lock:
+            self._health(name).submits.append(seconds)
+
+    def record(self, name, ok, seconds):
+        """Записує результат генерації та оновлює стан вимикача"""
+        with self._lock:
+            health = self._health(name)
+            health.outcomes.append((ok, seconds))
+            if ok:
+                health.consecutive_failures = 0
+                health.state = CLOSED
+                return
+            health.consecutive_failures += 1
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                health.state = OPEN
+                health.opened_at = self.clock()
+
+    def record_dispatch(self, timings):
+        """Переносить таймінги ``provider_dispatch.dispatch`` у статистику
+
+        Програвші (``lost``) нічого не кажуть про здоровʼя і не записуються;
+        не завершені до таймауту (``running``) рахуються як помилка.
+        """
+        for name, timing in timings.items():
+            if timing["status"] == "won":
+                self.record(name, True, timing["seconds"])
+            elif timing["status"] in ("failed", "running"):
+                self.record(name, False, timing["seconds"])
+
+    def snapshot(self):
+        """Поточна статистика всіх провайдерів для відображення"""
+        with self._lock:
+            return {
+                name: {
+                    "state": health.state,
+                    "score": health.score(),
+                    "success_rate": health.success_rate(),
+                    "mean_completion": health.mean_completion(),
+                    "mean_submit": health.mean_submit(),
+                    "samples": len(health.outcomes),
+                }
+                for name, health in self._providers.items()
+            }
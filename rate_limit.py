@@ -0,0 +1,222 @@
+"""Ліміти звернень до провайдерів і вартості генерацій на процес.
+
+Для кожного провайдера діють token bucket (``rate`` генерацій на хвилину з
+запасом ``burst``) і обмеження одночасних генерацій (``concurrency``).
+Задачі, яким бракує слота або токена, не отримують помилку, а стають у
+чергу до провайдера (FIFO) і бачать свою позицію через ``on_wait``.
+
+Поверх цього ``admit`` перевіряє квоту сесії (генерацій на годину) і денний
+бюджет за оцінкою вартості; кожен фактичний запуск провайдера (зокрема
+хеджований) списує свою вартість з бюджету.
+
+Уся змінна інформація живе у сховищі й змінюється лише кількома атомарними
+операціями над ключами (``take_token``, ``add``, ``get``, ``enqueue``,
+``position``, ``length``, ``dequeue``), тож ``MemoryLimiterStore`` можна
+замінити спільним сховищем з тими самими методами (наприклад, Redis з Lua
+скриптами) для кількох реплік без зміни логіки ``RateLimiter``.
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+POLL_SECONDS = 0.5  # як часто перевіряти чергу до провайдера
+SWEEP_SECONDS = 600  # як часто прибирати прострочені лічильники
+
+# назва провайдера -> ліміти; cost — оцінка вартості однієї генерації в USD
+DEFAULT_LIMITS = {
+    "replicate_ltx": {"rate": 10, "burst": 5, "concurrency": 8, "cost": 0.01},
+    "segmind_direct": {"rate": 10, "burst": 3, "concurrency": 4, "cost": 0.005},
+    "fal_direct": {"rate": 10, "burst": 3, "concurrency": 4, "cost": 0.01},
+}
+DEFAULT_SESSION_QUOTA = 20  # генерацій на сесію за годину
+DEFAULT_DAILY_BUDGET = 5.0  # USD
+
+
+class AdmissionError(Exception):
+    """Задачу не допущено: вичерпано квоту, бюджет або її скасовано в черзі"""
+
+
+class MemoryLimiterStore:
+    """Стан лімітера в пам'яті процесу; кожна операція атомарна"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}  # ключ -> (токени, час оновлення)
+        self._counters = {}  # ключ -> (значення, момент закінчення або None)
+        self._queues = {}  # ключ -> список квитків у порядку прибуття
+        self._next_sweep = clock() + SWEEP_SECONDS
+
+    def take_token(self, key, rate, burst):
+        """Бере токен; повертає 0 або скільки секунд чекати до наступного"""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def _counter(self, key, now):
+        # Викликається під self._lock; прострочені лічильники видаляються,
+        # а раз на SWEEP_SECONDS — і ті, до яких більше ніхто не звертається
+        if now >= self._next_sweep:
+            self._next_sweep = now + SWEEP_SECONDS
+            for stale in [k for k, (_, expires) in self._counters.items()
+                          if expires is not None and now >= expires]:
+                del self._counters[stale]
+        value, expires = self._counters.get(key, (0, None))
+        if expires is not None and now >= expires:
+            del self._counters[key]
+            return 0, None
+        return value, expires
+
+    def add(self, key, amount, limit=None, ttl=None):
+        """Додає ``amount``, якщо сума не перевищить ``limit``; повертає (успіх, сума)
+
+        Лічильник не опускається нижче нуля, а нульовий видаляється.
+        """
+        now = self.clock()
+        with self._lock:
+            value, expires = self._counter(key, now)
+            if limit is not None and amount > 0 and value + amount > limit:
+                return False, value
+            value = max(0, value + amount)
+            if not value:
+                self._counters.pop(key, None)
+                return True, 0
+            if expires is None and ttl is not None:
+                expires = now + ttl
+            self._counters[key] = (value, expires)
+            return True, value
+
+    def get(self, key):
+        with self._lock:
+            return self._counter(key, self.clock())[0]
+
+    def enqueue(self, key, ticket):
+        with self._lock:
+            self._queues.setdefault(key, []).append(ticket)
+
+    def position(self, key, ticket):
+        """Позиція квитка в черзі (1 — перший)"""
+        with self._lock:
+            return self._queues[key].index(ticket) + 1
+
+    def length(self, key):
+        with self._lock:
+            return len(self._queues.get(key, []))
+
+    def dequeue(self, key, ticket):
+        with self._lock:
+            queue = self._queues.get(key, [])
+            if ticket in queue:
+                queue.remove(ticket)
+
+
+class RateLimiter:
+    """Token bucket, обмеження одночасності, квота сесії і бюджет"""
+
+    def __init__(self, store=None, limits=DEFAULT_LIMITS, session_quota=DEFAULT_SESSION_QUOTA,
+                 daily_budget=DEFAULT_DAILY_BUDGET, clock=time.time):
+        self.store = store or MemoryLimiterStore()
+        self.limits = limits
+        self.session_quota = session_quota
+        self.daily_budget = daily_budget
+        self.clock = clock  # календарний час для годинних і денних вікон
+
+    def _budget_key(self):
+        return f"budget:{int(self.clock() // 86400)}"
+
+    def spent(self):
+        """Оцінка витрат за поточну добу (UTC), USD"""
+        return self.store.get(self._budget_key())
+
+    def admit(self, session_id, providers):
+        """Перевіряє квоту сесії і бюджет перед постановкою задачі в чергу
+
+        Списує одну генерацію з квоти сесії і повертає ключ годинного
+        вікна, з якого її списано (повернути — ``refund`` з цим ключем);
+        бюджет лише перевіряється за найдешевшим з ``providers``.
+        """
+        costs = [self.limits[name]["cost"] for name in providers if name in self.limits]
+        estimate = min(costs) if costs else 0.0
+        if self.spent() + estimate > self.daily_budget:
+            raise AdmissionError(f"денний бюджет ${self.daily_budget:.2f} вичерпано, спробуйте завтра")
+        key = self._session_key(session_id)
+        ok, _ = self.store.add(key, 1, self.session_quota, ttl=3600)
+        if not ok:
+            raise AdmissionError(f"не більше {self.session_quota} генерацій на годину для однієї сесії")
+        return key
+
+    def refund(self, quota_key):
+        """Повертає генерацію у вікно квоти, з якого її списав ``admit``
+
+        Після зміни години повертається саме те вікно (або нічого, якщо воно
+        вже прострочене), а не поточне, тож квота нової години не росте.
+        """
+        self.store.add(quota_key, -1)
+
+    def _session_key(self, session_id):
+        return f"session:{session_id}:{int(self.clock() // 3600)}"
+
+    @contextmanager
+    def slot(self, provider, cancel=None, on_wait=None):
+        """Чекає в черзі до провайдера на слот і токен, списує вартість запуску
+
+        ``on_wait(позиція, секунд_до_спроби)`` викликається під час очікування;
+        встановлена подія ``cancel`` перериває очікування ``AdmissionError``.
+        """
+        limits = self.limits.get(provider)
+        if limits is None:
+            yield
+            return
+
+        queue_key = f"queue:{provider}"
+        slots_key = f"slots:{provider}"
+        ticket = uuid.uuid4().hex
+        self.store.enqueue(queue_key, ticket)
+        try:
+            while True:
+                position = self.store.position(queue_key, ticket)
+                wait = POLL_SECONDS
+                if position == 1:
+                    acquired, _ = self.store.add(slots_key, 1, limits["concurrency"])
+                    if acquired:
+                        wait = self.store.take_token(f"bucket:{provider}", limits["rate"] / 60, limits["burst"])
+                        if not wait:
+                            break
+                        self.store.add(slots_key, -1)
+                if on_wait:
+                    on_wait(position, wait)
+                pause = min(wait, POLL_SECONDS)
+                if cancel is not None:
+                    if cancel.wait(pause):
+                        raise AdmissionError("скасовано в черзі до провайдера")
+                else:
+                    time.sleep(pause)
+        finally:
+            self.store.dequeue(queue_key, ticket)
+
+        try:
+            charged, _ = self.store.add(self._budget_key(), limits["cost"], self.daily_budget, ttl=86400)
+            if not charged:
+                raise AdmissionError(f"денний бюджет ${self.daily_budget:.2f} вичерпано")
+            yield
+        finally:
+            self.store.add(slots_key, -1)
+
+    def snapshot(self):
+        """Зайняті слоти і довжина черги кожного провайдера"""
+        return {
+            name: {
+                "running": self.store.get(f"slots:{name}"),
+                "concurrency": limits["concurrency"],
+                "waiting": self.store.length(f"queue:{name}"),
+            }
+            for name, limits in self.limits.items()
+        }
@@ -0,0 +1,195 @@
+"""Кеш готових демо анімацій з адресацією за вмістом.
+
+Результат демо рендеру залежить лише від байтів зображення, набору ефектів
+і seed, тож ключ — SHA-256 від цих трьох складових. Два рівні: пам'ять
+(``OrderedDict`` з LRU витісненням за сумарним розміром) і диск (файли в
+каталозі кешу, LRU за часом останнього доступу). Кеш потокобезпечний і
+розрахований на один екземпляр на процес.
+
+``PreparedImageCache`` тримає в пам'яті підготовлені до рендеру
+зображення (декодований масив, палітра, розмита копія) за ключем
+зображення і роздільності, тож новий seed, промпт чи формат для того
+самого фото не декодує його заново.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ltx_demo_cache")
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_BYTES = 512 * 1024 * 1024
+DEFAULT_PREPARED_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(image_bytes, effects, seed, variant=""):
+    """Ключ кешу: хеш зображення + нормалізований набір ефектів + seed"""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_bytes).digest())
+    digest.update(",".join(sorted(effects)).encode())
+    digest.update(f"|{seed}|{variant}".encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Дворівневий LRU кеш байтів анімацій (пам'ять + диск)"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_memory_bytes=DEFAULT_MEMORY_BYTES,
+                 max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def get(self, key):
+        """Повертає збережені байти або None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return data
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        """Зберігає байти в обох рівнях кешу"""
+        with self._lock:
+            self._remember(key, data)
+        self._write_disk(key, data)
+
+    def get_or_render(self, key, render):
+        """Повертає (байти, чи_з_кешу), викликаючи ``render()`` лише при промаху"""
+        data = self.get(key)
+        if data is not None:
+            return data, True
+        data = render()
+        if data:
+            self.put(key, data)
+        return data, False
+
+    def clear(self):
+        """Очищає обидва рівні кешу"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.cache_dir:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".bin"):
+                    os.remove(entry.path)
+
+    def _remember(self, key, data):
+        # Викликається під self._lock
+        if len(data) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # оновлюємо час доступу для LRU
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.cache_dir or len(data) > self.max_disk_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".bin")]
+            files = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.stats["evictions"] += 1
+
+
+class PreparedImageCache:
+    """LRU кеш підготовлених зображень, обмежений сумарним розміром масивів"""
+
+    def __init__(self, max_bytes=DEFAULT_PREPARED_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_prepare(self, key, prepare):
+        """Повертає (зображення, чи_з_кешу), викликаючи ``prepare()`` лише при промаху"""
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return prepared, True
+            self.stats["misses"] += 1
+        prepared = prepare()
+        with self._lock:
+            self._entries[key] = prepared
+            self._entries.move_to_end(key)
+            self._evict(keep=key)
+        return prepared, False
+
+    def _evict(self, keep):
+        # Викликається під self._lock; розмита копія зʼявляється пізніше,
+        # тож розмір рахується наново
+        total = sum(prepared.nbytes for prepared in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key).nbytes
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
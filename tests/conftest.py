@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Модулі застосунку лежать у корені репозиторію
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
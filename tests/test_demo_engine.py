@@ -0,0 +1,36 @@
+"""Точність векторного рушія відносно старого PIL-рендеру"""
+
+import itertools
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from demo_engine import EFFECT_KEYWORDS, render_frames, render_frames_reference
+
+COMBINATIONS = [frozenset(combo) for size in range(len(EFFECT_KEYWORDS) + 1)
+                for combo in itertools.combinations(sorted(EFFECT_KEYWORDS), size)]
+
+
+@pytest.fixture(scope="module")
+def noise():
+    """Рівномірний шум 403 × 301 — на ньому виміряні межі з докстрінгу рушія"""
+    return np.random.default_rng(0).integers(0, 256, (301, 403, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("effects", COMBINATIONS, ids=lambda effects: "+".join(sorted(effects)) or "none")
+def test_matches_reference_within_documented_bounds(noise, effects):
+    frames = np.stack(render_frames(noise, effects, rng=np.random.default_rng(5))).astype(np.int16)
+    reference = np.stack([
+        np.asarray(frame) for frame in
+        render_frames_reference(Image.fromarray(noise), effects, rng=np.random.default_rng(5))
+    ]).astype(np.int16)
+    error = np.abs(frames - reference)
+
+    if "water" in effects:
+        assert error.mean() < 0.25
+        assert (error > 3).mean() < 0.006
+    elif "eyes" in effects:
+        assert error.max() <= 1
+    else:
+        assert error.max() == 0
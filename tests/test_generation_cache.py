@@ -0,0 +1,101 @@
+"""Single-flight і TTL кеш професійних генерацій"""
+
+import threading
+
+import pytest
+
+from generation_cache import COALESCED, HIT, MISS, GenerationCache, generation_key
+
+FOLLOWERS = 4
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def run_concurrently(cache, key, generate):
+    """Лідер і ``FOLLOWERS`` ідентичних запитів; ``generate`` тримається,
+    доки всі послідовники не почнуть чекати"""
+    waiting = threading.Semaphore(0)
+    outcomes = []
+
+    def blocking_generate():
+        for _ in range(FOLLOWERS):
+            assert waiting.acquire(timeout=5)
+        return generate()
+
+    def call():
+        try:
+            outcomes.append(cache.get_or_generate(key, blocking_generate, on_wait=waiting.release))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(FOLLOWERS + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+def test_identical_requests_generate_once():
+    cache = GenerationCache()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return {"video_url": "https://v/1.mp4"}
+
+    outcomes = run_concurrently(cache, "k", generate)
+
+    assert len(calls) == 1
+    assert sorted(source for _, source in outcomes) == sorted([MISS] + [COALESCED] * FOLLOWERS)
+    assert all(entry == {"video_url": "https://v/1.mp4"} for entry, _ in outcomes)
+    assert cache.get_or_generate("k", generate) == ({"video_url": "https://v/1.mp4"}, HIT)
+    assert len(calls) == 1
+
+
+def test_leader_error_reaches_followers_and_is_not_cached():
+    cache = GenerationCache()
+
+    def generate():
+        raise RuntimeError("провайдер недоступний")
+
+    outcomes = run_concurrently(cache, "k", generate)
+
+    assert len(outcomes) == FOLLOWERS + 1
+    assert all(isinstance(e, RuntimeError) and str(e) == "провайдер недоступний" for e in outcomes)
+    assert cache.get("k") is None
+    assert cache.stats["failures"] == 1
+    assert cache.get_or_generate("k", lambda: {"video_url": "u"}) == ({"video_url": "u"}, MISS)
+
+
+def test_entry_expires_after_ttl():
+    clock = FakeClock()
+    cache = GenerationCache(ttl=60, clock=clock)
+    cache.put("k", {"video_url": "u"})
+
+    clock.advance(60)
+    assert cache.get("k") == {"video_url": "u"}
+    clock.advance(1)
+    assert cache.get("k") is None
+    assert cache.stats["expired"] == 1
+    assert cache.get_or_generate("k", lambda: {"video_url": "new"}) == ({"video_url": "new"}, MISS)
+
+
+@pytest.mark.parametrize("change", [
+    {"prompt": "інший промпт"},
+    {"image_bytes": b"other"},
+    {"duration": 10},
+])
+def test_key_depends_on_image_prompt_and_params(change):
+    base = {"image_bytes": b"image", "prompt": "рух", "duration": 5}
+    assert generation_key(**base) == generation_key(**{**base, "prompt": "  рух "})
+    assert generation_key(**base) != generation_key(**{**base, **change})
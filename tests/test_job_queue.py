@@ -0,0 +1,67 @@
+"""Час очікування задач у черзі, трасування та забування завершених задач"""
+
+import threading
+import time
+
+from job_queue import CANCELED, DONE, JobQueue
+from tracing import MetricsRegistry, Trace
+
+
+def test_queued_seconds_for_run_and_canceled_jobs():
+    queue = JobQueue(workers=1)
+    release = threading.Event()
+    running = queue.submit("s", "busy", lambda job: release.wait(5))
+    waiting = queue.submit("s", "waiting", lambda job: None)
+
+    assert queue.cancel(waiting.id)
+    assert waiting.status == CANCELED and waiting.started is None
+    assert waiting.queued_seconds == waiting.finished - waiting.created
+
+    release.set()
+    running._future.result(5)
+    assert running.status == DONE
+    assert running.queued_seconds == running.started - running.created
+
+
+def test_trace_times_execution_and_reports_queue_wait_separately():
+    metrics = MetricsRegistry()
+    queue = JobQueue(workers=1)
+    release = threading.Event()
+    busy = queue.submit("s", "busy", lambda job: release.wait(5))
+    waiting = queue.submit("s", "waiting", lambda job: None, trace=Trace("demo", metrics))
+    time.sleep(0.2)
+    release.set()
+    busy._future.result(5)
+    waiting._future.result(5)
+
+    assert waiting.trace.queued_seconds >= 0.2
+    assert metrics._queued["demo"].sum == waiting.trace.queued_seconds
+    assert metrics._jobs[("demo", "ok")].sum < 0.1
+    assert "ltx_job_queue_seconds_count{mode=\"demo\"} 1" in metrics.render_prometheus()
+
+
+def _finish(queue, session_id, payload):
+    job = queue.submit(session_id, "job", lambda job: {"animation": payload})
+    job._future.result(5)
+    return job
+
+
+def test_finished_jobs_bounded_by_bytes():
+    queue = JobQueue(workers=1, max_finished_bytes=250, finished_ttl=None)
+    first = _finish(queue, "a", b"x" * 100)
+    second = _finish(queue, "b", b"x" * 100)
+    assert first.nbytes == 100
+    assert queue.jobs([first.id, second.id]) == [first, second]
+
+    third = _finish(queue, "c", b"x" * 100)
+    assert queue.jobs([first.id, second.id, third.id]) == [second, third]
+
+
+def test_finished_jobs_expire_after_ttl():
+    queue = JobQueue(workers=1, max_finished_bytes=None, finished_ttl=60)
+    old = _finish(queue, "a", b"old")
+    fresh = _finish(queue, "b", b"fresh")
+    old.finished -= 61
+
+    assert queue.jobs([old.id, fresh.id]) == [fresh]
+    assert queue.get(old.id) is None
@@ -0,0 +1,205 @@
+"""Очікування генерацій і приймач вебхуків проти локального фейкового Replicate"""
+
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from prediction_waiter import WebhookReceiver, next_interval, wait_for_prediction
+
+SECRET = "whsec_" + base64.b64encode(b"test-secret").decode()
+
+
+class FakeReplicate:
+    """HTTP сервер, що віддає статуси генерації за заданою послідовністю"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.polls = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = fake.statuses[min(fake.polls, len(fake.statuses) - 1)]
+                fake.polls += 1
+                body = json.dumps({"id": self.path.rsplit("/", 1)[-1], **status}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/predictions"
+
+    def fetch_status(self, prediction_id):
+        return lambda: requests.get(f"{self.url}/{prediction_id}", timeout=5).json()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def replicate():
+    servers = []
+
+    def start(statuses):
+        servers.append(FakeReplicate(statuses))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def receiver():
+    receiver = WebhookReceiver(secret=SECRET)
+    yield receiver
+    receiver.close()
+
+
+def sign(body, webhook_id="msg_1", timestamp=None, secret=SECRET):
+    timestamp = str(int(timestamp or time.time()))
+    key = base64.b64decode(secret.split("_", 1)[1])
+    digest = hmac.new(key, f"{webhook_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    return {
+        "webhook-id": webhook_id,
+        "webhook-timestamp": timestamp,
+        "webhook-signature": "v1," + base64.b64encode(digest).decode(),
+    }
+
+
+def post_webhook(receiver, prediction, headers=None):
+    body = json.dumps(prediction).encode()
+    return requests.post(f"http://127.0.0.1:{receiver.port}/", data=body,
+                         headers=sign(body) if headers is None else headers, timeout=5)
+
+
+def test_next_interval_grows_faster_while_starting():
+    assert next_interval(0.5, {"status": "processing"}) == 0.75
+    assert next_interval(4.0, {"status": "starting"}) == 5.0
+    assert next_interval(4.0, {"status": "processing"}) == 2.0
+    assert next_interval(4.0, None) == 5.0
+
+
+def test_polls_until_terminal_status(replicate):
+    fake = replicate([{"status": "starting"}, {"status": "processing"},
+                      {"status": "succeeded", "output": "https://replicate.delivery/v.mp4"}])
+    progress = []
+    status = wait_for_prediction(fake.fetch_status("p1"), initial_interval=0.01,
+                                 on_progress=lambda elapsed, s: progress.append(s["status"]))
+    assert status["output"] == "https://replicate.delivery/v.mp4"
+    assert fake.polls == 3
+    assert progress == ["starting", "processing"]
+
+
+def test_timeout_returns_last_status(replicate):
+    fake = replicate([{"status": "processing"}])
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    status = wait_for_prediction(fake.fetch_status("p1"), timeout=3.0, clock=lambda: now[0],
+                                 sleep=sleep)
+    assert status["status"] == "processing"
+    assert now[0] == pytest.approx(3.0)
+    # 0.5 + 0.75 + 1.125 + 0.625 (залишок), далі останнє опитування
+    assert fake.polls == 5
+
+
+def test_min_interval_limits_polling(replicate):
+    fake = replicate([{"status": "processing"}])
+    now = [0.0]
+    pauses = []
+
+    def wait(seconds):
+        pauses.append(seconds)
+        now[0] += seconds
+
+    wait_for_prediction(fake.fetch_status("p1"), timeout=40.0, clock=lambda: now[0], wait=wait,
+                        min_interval=15.0)
+    assert pauses == [15.0, 15.0, 10.0]
+
+
+def test_webhook_ends_wait_before_next_poll(replicate, receiver):
+    fake = replicate([{"status": "processing"}])
+    prediction = {"id": "p1", "status": "succeeded", "output": "https://replicate.delivery/v.mp4"}
+    threading.Timer(0.2, post_webhook, (receiver, prediction)).start()
+
+    start = time.monotonic()
+    status = wait_for_prediction(fake.fetch_status("p1"), timeout=30.0, min_interval=15.0,
+                                 wait=lambda seconds: receiver.wait("p1", seconds))
+    assert status == prediction
+    assert time.monotonic() - start < 5.0
+    assert fake.polls == 1
+    assert receiver._events == {}
+
+
+def test_webhook_before_wait_is_returned_immediately(receiver):
+    prediction = {"id": "p1", "status": "failed"}
+    assert post_webhook(receiver, prediction).status_code == 200
+    assert receiver.wait("p1", 0) == prediction
+    assert receiver._events == {}
+
+
+def test_wait_timeout_drops_event(receiver):
+    assert receiver.wait("p1", 0.01) is None
+    assert receiver._events == {}
+
+
+def test_rejects_unsigned_and_forged_webhooks(receiver):
+    prediction = {"id": "p1", "status": "succeeded", "output": "http://169.254.169.254/"}
+    assert post_webhook(receiver, prediction, headers={}).status_code == 401
+    body = json.dumps(prediction).encode()
+    forged = sign(body, secret="whsec_" + base64.b64encode(b"other").decode())
+    assert post_webhook(receiver, prediction, headers=forged).status_code == 401
+    stale = sign(body, timestamp=time.time() - 3600)
+    assert post_webhook(receiver, prediction, headers=stale).status_code == 401
+    assert receiver.wait("p1", 0) is None
+
+
+def test_ignores_non_terminal_and_malformed_webhooks(receiver):
+    assert post_webhook(receiver, {"id": "p1", "status": "processing"}).status_code == 200
+    assert receiver.wait("p1", 0) is None
+    body = b"not json"
+    response = requests.post(f"http://127.0.0.1:{receiver.port}/", data=body, headers=sign(body),
+                             timeout=5)
+    assert response.status_code == 400
+
+
+def test_results_are_bounded():
+    receiver = WebhookReceiver(secret=SECRET, max_entries=2)
+    try:
+        for index in range(3):
+            receiver.record(f"p{index}", {"id": f"p{index}", "status": "succeeded"})
+        assert list(receiver._results) == ["p1", "p2"]
+    finally:
+        receiver.close()
+
+
+def test_receiver_defaults_to_localhost(receiver):
+    assert receiver.server.server_address[0] == "127.0.0.1"
+
+
+def test_receiver_requires_secret():
+    with pytest.raises(ValueError):
+        WebhookReceiver()
+
+
+def test_animator_refuses_webhook_without_secret():
+    animator = pytest.importorskip("animator")
+    with pytest.raises(ValueError):
+        animator.Animator(secrets={"REPLICATE_WEBHOOK_URL": "https://example.com/hook"})
@@ -0,0 +1,78 @@
+"""Повернення квоти сесії, коли професійна задача не запускає провайдера"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from animator import Animator
+from job_queue import Job
+from provider_dispatch import ProviderError
+from rate_limit import RateLimiter
+from tracing import Trace
+from video_store import VideoStoreError
+
+
+@pytest.fixture
+def image_bytes():
+    buffered = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(buffered, format="JPEG")
+    return buffered.getvalue()
+
+
+@pytest.fixture
+def animator(monkeypatch):
+    animator = Animator({}, rate_limiter=RateLimiter(session_quota=5))
+
+    def fetch(url):
+        raise VideoStoreError("сховище не завантажує відео в тестах")
+
+    monkeypatch.setattr(animator.video_store, "fetch", fetch)
+    return animator
+
+
+def used(animator):
+    limiter = animator.rate_limiter
+    return limiter.store.get(limiter._session_key("s"))
+
+
+def run(animator, image_bytes, providers):
+    quota_key = animator.rate_limiter.admit("s", providers)
+    job = Job("s", "photo.jpg", None, trace=Trace("professional"))
+    return animator.run_professional_job(job, image_bytes, "волосся", providers=providers, quota_key=quota_key)
+
+
+def fake_provider(animator, monkeypatch, outcome):
+    def runners(image, prompt, duration, trace=None, providers=None):
+        def run(cancel):
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return [("fal_direct", run)]
+    monkeypatch.setattr(animator, "build_provider_runners", runners)
+
+
+def test_launched_generation_keeps_quota(animator, image_bytes, monkeypatch):
+    fake_provider(animator, monkeypatch, "https://v3.fal.media/files/v.mp4")
+    assert run(animator, image_bytes, ["fal_direct"])["cache"] == "miss"
+    assert used(animator) == 1
+
+
+def test_cache_hit_refunds_quota(animator, image_bytes, monkeypatch):
+    fake_provider(animator, monkeypatch, "https://v3.fal.media/files/v.mp4")
+    run(animator, image_bytes, ["fal_direct"])
+    assert run(animator, image_bytes, ["fal_direct"])["cache"] == "hit"
+    assert used(animator) == 1
+
+
+def test_failure_before_launch_refunds_quota(animator, image_bytes):
+    with pytest.raises(ProviderError):
+        run(animator, image_bytes, [])
+    assert used(animator) == 0
+
+
+def test_failed_launch_keeps_quota(animator, image_bytes, monkeypatch):
+    fake_provider(animator, monkeypatch, ProviderError("FAL: 500"))
+    with pytest.raises(ProviderError):
+        run(animator, image_bytes, ["fal_direct"])
+    assert used(animator) == 1
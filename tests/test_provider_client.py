@@ -0,0 +1,106 @@
+"""Повтори ``ProviderClient`` проти локального сервера"""
+
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from provider_client import ProviderClient
+
+
+@pytest.fixture
+def server():
+    """Сервер, що відповідає за сценарієм: список статусів або "drop" (обірвати
+    зʼєднання після прочитання тіла); після сценарію — 200"""
+    script = []
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def handle_one(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            seen.append(self.command)
+            action = script.pop(0) if script else 200
+            if action == "drop":
+                self.close_connection = True
+                return
+            status, headers = action if isinstance(action, tuple) else (action, {})
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_POST = handle_one
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", script, seen
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client():
+    client = ProviderClient("test", {}, timeout=(1, 2), max_retries=2, backoff=0.01)
+    yield client
+    client.close()
+
+
+def test_post_not_retried_after_body_was_sent(server, client):
+    base, script, seen = server
+    script.append("drop")
+    with pytest.raises(requests.ConnectionError):
+        client.post(f"{base}/predictions", json={"prompt": "x"})
+    assert seen == ["POST"]
+    assert client.stats["retries"] == 0
+
+
+def test_post_retried_on_429(server, client):
+    base, script, seen = server
+    script.append(429)
+    response = client.post(f"{base}/predictions", json={"prompt": "x"})
+    assert response.status_code == 200
+    assert seen == ["POST", "POST"]
+
+
+def test_post_not_retried_on_5xx(server, client):
+    base, script, seen = server
+    script.append(502)
+    assert client.post(f"{base}/predictions", json={}).status_code == 502
+    assert seen == ["POST"]
+
+
+def test_post_retried_when_connection_refused(client):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # Порт закрито: зʼєднання не встановлюється, запит точно не відправлено
+    with pytest.raises(requests.ConnectionError):
+        client.post(f"http://127.0.0.1:{port}/predictions", json={})
+    assert client.stats["requests"] == 3
+    assert client.stats["retries"] == 2
+
+
+def test_get_retried_on_5xx_honouring_retry_after(server, client):
+    base, script, seen = server
+    script.extend([(503, {"Retry-After": "1"}), 500])
+    start = time.monotonic()
+    response = client.get(f"{base}/predictions/1")
+    assert response.status_code == 200
+    assert seen == ["GET", "GET", "GET"]
+    assert time.monotonic() - start >= 1.0
+    assert client.stats["retries"] == 2
+
+
+def test_last_response_returned_when_retries_exhausted(server, client):
+    base, script, seen = server
+    script.extend([503, 503, 503])
+    assert client.get(f"{base}/predictions/1").status_code == 503
+    assert len(seen) == 3
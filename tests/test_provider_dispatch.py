@@ -0,0 +1,80 @@
+"""Хеджування провайдерів у ``dispatch``"""
+
+import threading
+import time
+
+from provider_dispatch import dispatch
+
+
+def test_hedged_provider_starts_after_delay_and_loser_is_lost():
+    started = {}
+
+    def slow(cancel):
+        started["slow"] = time.monotonic()
+        cancel.wait(5)
+        return "https://slow/video.mp4"
+
+    def fast(cancel):
+        started["fast"] = time.monotonic()
+        return "https://fast/video.mp4"
+
+    result = dispatch([("slow", slow), ("fast", fast)], hedge_delay=0.3)
+
+    assert result["provider"] == "fast"
+    assert result["video_url"] == "https://fast/video.mp4"
+    assert started["fast"] - started["slow"] >= 0.3
+    assert result["timings"]["fast"]["status"] == "won"
+    assert result["timings"]["slow"]["status"] == "lost"
+
+
+def test_no_hedge_when_first_provider_wins_in_time():
+    result = dispatch([("a", lambda cancel: "https://a"), ("b", lambda cancel: "https://b")],
+                      hedge_delay=5)
+
+    assert result["provider"] == "a"
+    assert result["timings"]["b"]["status"] == "skipped"
+
+
+def test_next_provider_starts_at_once_when_launched_ones_failed():
+    def broken(cancel):
+        raise RuntimeError("502")
+
+    start = time.monotonic()
+    result = dispatch([("a", broken), ("b", lambda cancel: "https://b")], hedge_delay=30)
+
+    assert time.monotonic() - start < 5
+    assert result["provider"] == "b"
+    assert result["timings"]["a"]["status"] == "failed"
+    assert result["timings"]["a"]["error"] == "502"
+
+
+def test_timeout_leaves_provider_running():
+    result = dispatch([("a", lambda cancel: cancel.wait(5))], timeout=0.2)
+
+    assert result["provider"] is None
+    assert result["timings"]["a"]["status"] == "running"
+    assert result["timings"]["a"]["seconds"] >= 0.2
+
+
+def test_failure_completed_with_winner_is_failed_not_lost():
+    gate = threading.Event()
+
+    def broken(cancel):
+        gate.wait(5)
+        raise RuntimeError("впав")
+
+    def ok(cancel):
+        gate.wait(5)
+        return "https://ok"
+
+    def on_progress(elapsed, timings):
+        # Обидва вже запущені: відпускаємо їх і даємо обом завершитися до наступного wait
+        if all(t["status"] == "running" for t in timings.values()) and not gate.is_set():
+            gate.set()
+            time.sleep(0.2)
+
+    result = dispatch([("broken", broken), ("ok", ok)], hedge_delay=0, on_progress=on_progress)
+
+    assert result["provider"] == "ok"
+    assert result["timings"]["broken"]["status"] == "failed"
+    assert result["timings"]["broken"]["error"] == "впав"
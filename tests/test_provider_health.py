@@ -0,0 +1,151 @@
+"""Оцінювання провайдерів і переходи вимикача на змодельованому часі"""
+
+import pytest
+
+from provider_health import CLOSED, HALF_OPEN, OPEN, PRIOR_COMPLETION_SECONDS, ProviderRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def router(clock):
+    return ProviderRouter(window=5, failure_threshold=3, cooldown=60.0, clock=clock)
+
+
+def state(router, name):
+    return router.snapshot()[name]["state"]
+
+
+def test_without_history_keeps_priority_order(router):
+    assert router.rank(["replicate_ltx", "segmind_direct", "fal_direct"]) == [
+        "replicate_ltx", "segmind_direct", "fal_direct"]
+
+
+def test_ranks_by_completion_time_over_success_rate(router):
+    router.record("replicate_ltx", True, 90.0)
+    router.record("segmind_direct", True, 40.0)
+    assert router.rank(["replicate_ltx", "segmind_direct"]) == ["segmind_direct", "replicate_ltx"]
+
+    # Половина помилок подвоює очікуваний час: 40 / 0.5 = 80 < 90
+    router.record("segmind_direct", False, 5.0)
+    assert router.snapshot()["segmind_direct"]["score"] == pytest.approx(80.0)
+    assert router.rank(["replicate_ltx", "segmind_direct"]) == ["segmind_direct", "replicate_ltx"]
+
+    router.record("segmind_direct", False, 5.0)
+    assert router.snapshot()["segmind_direct"]["score"] == pytest.approx(120.0)
+    assert router.rank(["replicate_ltx", "segmind_direct"]) == ["replicate_ltx", "segmind_direct"]
+
+
+def test_new_provider_scores_with_optimistic_prior(router):
+    router.record("replicate_ltx", True, PRIOR_COMPLETION_SECONDS + 10)
+    assert router.rank(["replicate_ltx", "fal_direct"]) == ["fal_direct", "replicate_ltx"]
+
+
+def test_window_forgets_old_outcomes(router):
+    for _ in range(5):
+        router.record("fal_direct", True, 100.0)
+    for _ in range(5):
+        router.record("fal_direct", True, 20.0)
+    snapshot = router.snapshot()["fal_direct"]
+    assert snapshot["samples"] == 5
+    assert snapshot["mean_completion"] == pytest.approx(20.0)
+
+
+def test_opens_after_consecutive_failures(router):
+    router.record("fal_direct", False, 1.0)
+    router.record("fal_direct", False, 1.0)
+    router.record("fal_direct", True, 30.0)  # успіх обнуляє серію
+    router.record("fal_direct", False, 1.0)
+    router.record("fal_direct", False, 1.0)
+    assert state(router, "fal_direct") == CLOSED
+    router.record("fal_direct", False, 1.0)
+    assert state(router, "fal_direct") == OPEN
+    assert router.rank(["fal_direct", "replicate_ltx"]) == ["replicate_ltx"]
+
+
+def test_half_open_probe_after_cooldown(router, clock):
+    for _ in range(3):
+        router.record("fal_direct", False, 1.0)
+    clock.advance(59.9)
+    assert router.rank(["fal_direct"]) == []
+
+    clock.advance(0.1)
+    assert router.rank(["fal_direct"]) == ["fal_direct"]
+    assert state(router, "fal_direct") == HALF_OPEN
+    # Поки пробний запит триває, інші запити провайдера не отримують
+    assert router.rank(["fal_direct"]) == []
+
+
+def test_half_open_success_closes(router, clock):
+    for _ in range(3):
+        router.record("fal_direct", False, 1.0)
+    clock.advance(60.0)
+    router.rank(["fal_direct"])
+    router.record("fal_direct", True, 25.0)
+    assert state(router, "fal_direct") == CLOSED
+    assert router.rank(["fal_direct"]) == ["fal_direct"]
+
+
+def test_half_open_failure_reopens_for_full_cooldown(router, clock):
+    for _ in range(3):
+        router.record("fal_direct", False, 1.0)
+    clock.advance(60.0)
+    router.rank(["fal_direct"])
+    clock.advance(10.0)
+    router.record("fal_direct", False, 10.0)
+    assert state(router, "fal_direct") == OPEN
+    clock.advance(59.0)
+    assert router.rank(["fal_direct"]) == []
+    clock.advance(1.0)
+    assert router.rank(["fal_direct"]) == ["fal_direct"]
+
+
+def test_lost_probe_is_retried_after_another_cooldown(router, clock):
+    for _ in range(3):
+        router.record("fal_direct", False, 1.0)
+    clock.advance(60.0)
+    assert router.rank(["fal_direct"]) == ["fal_direct"]
+    clock.advance(59.0)
+    assert router.rank(["fal_direct"]) == []
+    clock.advance(1.0)
+    assert router.rank(["fal_direct"]) == ["fal_direct"]
+
+
+def test_record_dispatch_skips_losers(router):
+    router.record_dispatch({
+        "replicate_ltx": {"status": "won", "seconds": 30.0},
+        "segmind_direct": {"status": "lost", "seconds": 12.0},
+        "fal_direct": {"status": "running", "seconds": 300.0},
+    })
+    snapshot = router.snapshot()
+    assert snapshot["replicate_ltx"]["samples"] == 1
+    assert "segmind_direct" not in snapshot
+    assert snapshot["fal_direct"]["success_rate"] == 0.0
+
+
+def test_order_keeps_runner_functions(router):
+    router.record("replicate_ltx", True, 90.0)
+    runners = [("replicate_ltx", "run_replicate"), ("fal_direct", "run_fal")]
+    assert router.order(runners) == [("fal_direct", "run_fal"), ("replicate_ltx", "run_replicate")]
+
+
+def test_submit_latency_is_reported(router):
+    assert router.rank(["replicate_ltx"]) == ["replicate_ltx"]
+    assert router.snapshot()["replicate_ltx"]["mean_submit"] is None
+    router.record_submit("replicate_ltx", 0.4)
+    router.record_submit("replicate_ltx", 0.6)
+    assert router.snapshot()["replicate_ltx"]["mean_submit"] == pytest.approx(0.5)
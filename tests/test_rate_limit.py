@@ -0,0 +1,64 @@
+"""Квота сесії та лічильники лімітера на змодельованому часі"""
+
+import pytest
+
+from rate_limit import SWEEP_SECONDS, AdmissionError, MemoryLimiterStore, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(10 * 3600 + 3599)  # 10:59:59
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(store=MemoryLimiterStore(clock=clock), session_quota=2, clock=clock)
+
+
+def test_quota_per_hour(limiter):
+    limiter.admit("s", [])
+    limiter.admit("s", [])
+    with pytest.raises(AdmissionError):
+        limiter.admit("s", [])
+
+
+def test_refund_returns_to_admitted_hour(limiter, clock):
+    quota_key = limiter.admit("s", [])
+    clock.now += 2  # 11:00:01
+    limiter.refund(quota_key)
+    assert limiter.store.get(quota_key) == 0
+    limiter.admit("s", [])
+    limiter.admit("s", [])
+    with pytest.raises(AdmissionError):
+        limiter.admit("s", [])
+
+
+def test_refund_never_goes_below_zero(limiter):
+    quota_key = limiter.admit("s", [])
+    limiter.refund(quota_key)
+    limiter.refund(quota_key)
+    assert limiter.store.get(quota_key) == 0
+    limiter.admit("s", [])
+    limiter.admit("s", [])
+    with pytest.raises(AdmissionError):
+        limiter.admit("s", [])
+
+
+def test_expired_counters_are_dropped(clock):
+    store = MemoryLimiterStore(clock=clock)
+    store.add("session:a:10", 1, ttl=3600)
+    store.add("session:b:10", 1, ttl=3600)
+    clock.now += 3600
+    assert store.get("session:a:10") == 0
+    assert "session:a:10" not in store._counters
+    clock.now += SWEEP_SECONDS
+    store.add("session:c:12", 1, ttl=3600)
+    assert list(store._counters) == ["session:c:12"]
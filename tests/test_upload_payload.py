@@ -0,0 +1,27 @@
+"""Розмір зображення для моделі"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from upload_payload import UploadPayload, model_size
+
+
+@pytest.mark.parametrize("size, expected", [
+    ((4000, 3000), (672, 512)),
+    ((3000, 4000), (512, 672)),
+    ((1920, 1080), (704, 384)),
+    ((704, 512), (704, 512)),
+    ((100, 20), (96, 32)),
+    ((10, 10), (32, 32)),
+])
+def test_model_size_fits_limits_in_multiples_of_32(size, expected):
+    assert model_size(*size) == expected
+
+
+def test_payload_is_resized_to_model_size():
+    upload = UploadPayload(Image.new("RGBA", (4000, 3000)))
+    assert (upload.width, upload.height) == (672, 512)
+    with Image.open(io.BytesIO(upload.jpeg)) as image:
+        assert image.size == (672, 512)
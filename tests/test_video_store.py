@@ -0,0 +1,90 @@
+"""Сховище відео проти локального фейкового CDN"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from provider_client import ProviderClient
+from video_store import VideoStore, VideoStoreError, check_url
+
+VIDEO = b"\x00\x00\x00\x18ftypmp42" + bytes(100_000)
+
+
+@pytest.fixture
+def cdn():
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if self.path.startswith("/redirect"):
+                self.send_response(302)
+                self.send_header("Location", self.path.split("?to=", 1)[1])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            time.sleep(0.2)  # завантаження триває, поки приходять інші виклики
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(VIDEO)))
+            self.end_headers()
+            self.wfile.write(VIDEO)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return VideoStore(ProviderClient("cdn", {}), store_dir=str(tmp_path), allowed_hosts=("127.0.0.1",))
+
+
+def test_concurrent_fetches_download_once(cdn, store):
+    base, seen = cdn
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(store.fetch(f"{base}/v.mp4")))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)  # частина викликів приходить після першого завантаження
+    for thread in threads:
+        thread.join()
+    assert seen == ["/v.mp4"]
+    assert len(set(paths)) == 1
+    assert store.stats["downloads"] == 1 and store.stats["hits"] == 5
+    assert store._locks == {}
+
+
+def test_follows_redirects_only_to_allowed_hosts(cdn, store):
+    base, _ = cdn
+    assert store.fetch(f"{base}/redirect?to=/v.mp4")
+    with pytest.raises(VideoStoreError):
+        store.fetch(f"{base}/redirect?to=http://169.254.169.254/latest/meta-data")
+
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd",
+    "ftp://replicate.delivery/v.mp4",
+    "http://169.254.169.254/latest/meta-data",
+    "http://localhost:8501/",
+    "https://evilreplicate.delivery/v.mp4",
+    "https://replicate.delivery.example.com/v.mp4",
+])
+def test_rejects_unknown_urls(url):
+    with pytest.raises(VideoStoreError):
+        check_url(url)
+
+
+@pytest.mark.parametrize("url", [
+    "https://replicate.delivery/pbxt/abc/output.mp4",
+    "https://v3.fal.media/files/abc/output.mp4",
+])
+def test_accepts_provider_cdns(url):
+    check_url(url)
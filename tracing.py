@@ -0,0 +1,246 @@
+"""Таймінги етапів задач, структуровані логи та метрики Prometheus.
+
+Кожна задача (демо рендер або професійна генерація) отримує ``Trace``;
+етапи загортаються в ``trace.stage(назва, **атрибути)``, що записує
+тривалість, розмір даних і результат (``ok``/``error``). Кожен завершений
+етап пишеться JSON рядком у лог ``ltx.trace`` і потрапляє в гістограми
+``MetricsRegistry``, які ``MetricsServer`` віддає у текстовому форматі
+Prometheus на ``/metrics``.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("ltx.trace")
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RUN_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)  # запуски сценарію Streamlit
+DEFAULT_METRICS_PORT = 9108
+
+
+class Histogram:
+    """Кумулятивна гістограма з фіксованими межами"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Потокобезпечні гістограми тривалостей і лічильники байтів"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}  # (етап, режим, результат) -> Histogram
+        self._jobs = {}  # (режим, результат) -> Histogram
+        self._queued = {}  # режим -> Histogram очікування в черзі
+        self._bytes = {}  # (етап, режим) -> байтів
+        self._counters = {}  # (назва, ((мітка, значення), ...)) -> значення
+        self._runs = {}  # вид запуску сценарію -> Histogram
+
+    def observe_stage(self, stage, mode, outcome, seconds, payload_bytes=None):
+        with self._lock:
+            self._stages.setdefault((stage, mode, outcome), Histogram()).observe(seconds)
+            if payload_bytes:
+                key = (stage, mode)
+                self._bytes[key] = self._bytes.get(key, 0) + payload_bytes
+
+    def observe_job(self, mode, outcome, seconds):
+        with self._lock:
+            self._jobs.setdefault((mode, outcome), Histogram()).observe(seconds)
+
+    def observe_queue(self, mode, seconds):
+        with self._lock:
+            self._queued.setdefault(mode, Histogram()).observe(seconds)
+
+    def observe_run(self, kind, seconds):
+        """Тривалість запуску сценарію: ``cold`` (перший у процесі), ``session`` або ``rerun``"""
+        with self._lock:
+            self._runs.setdefault(kind, Histogram(RUN_BUCKETS)).observe(seconds)
+
+    def run_summary(self):
+        """Кількість і середня тривалість запусків сценарію кожного виду"""
+        with self._lock:
+            return {kind: {"count": h.total, "mean": h.sum / h.total} for kind, h in self._runs.items()}
+
+    def increment(self, name, amount=1, **labels):
+        """Лічильник подій, напр. ``increment("ltx_result_cache", result="hit")``"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render_prometheus(self):
+        """Текстовий формат експозиції Prometheus"""
+        lines = []
+        with self._lock:
+            lines += _render_histogram(
+                "ltx_stage_duration_seconds", "Тривалість етапів задач",
+                ("stage", "mode", "outcome"), self._stages,
+            )
+            lines += _render_histogram(
+                "ltx_job_duration_seconds", "Тривалість виконання задач (без очікування в черзі)",
+                ("mode", "outcome"), self._jobs,
+            )
+            lines += _render_histogram(
+                "ltx_job_queue_seconds", "Очікування задач у черзі до запуску",
+                ("mode",), {(mode,): h for mode, h in self._queued.items()},
+            )
+            lines += _render_histogram(
+                "ltx_script_run_seconds", "Тривалість запусків сценарію Streamlit",
+                ("run",), {(kind,): h for kind, h in self._runs.items()},
+            )
+            lines.append("# HELP ltx_stage_payload_bytes_total Обсяг даних, оброблених етапами")
+            lines.append("# TYPE ltx_stage_payload_bytes_total counter")
+            for (stage, mode), value in sorted(self._bytes.items()):
+                lines.append(f'ltx_stage_payload_bytes_total{{stage="{stage}",mode="{mode}"}} {value}')
+            declared = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {name}_total counter")
+                    declared.add(name)
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"{name}_total{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(name, help_text, label_names, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in sorted(histograms.items()):
+        label_text = ",".join(f'{key}="{value}"' for key, value in zip(label_names, labels))
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {histogram.total}')
+        lines.append(f"{name}_sum{{{label_text}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{label_text}}} {histogram.total}")
+    return lines
+
+
+class Trace:
+    """Таймінги етапів однієї задачі; етапи можуть йти з різних потоків"""
+
+    def __init__(self, mode, metrics=None, **attributes):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.metrics = metrics
+        self.attributes = attributes
+        self.spans = []
+        self.started = time.time()
+        self.queued_seconds = 0.0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Задача вийшла з черги: тривалість і зсуви етапів рахуються від
+        цього моменту, а очікування йде окремою метрикою"""
+        now = time.perf_counter()
+        self.queued_seconds = now - self._start
+        self._start = now
+        self.started = time.time()
+        if self.metrics:
+            self.metrics.observe_queue(self.mode, self.queued_seconds)
+
+    @contextmanager
+    def stage(self, name, **attributes):
+        """Вимірює етап; атрибути можна доповнити через повернений словник"""
+        span = {"stage": name, "outcome": "ok", **attributes}
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["outcome"] = "error"
+            span["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            span["offset"] = round(start - self._start, 4)
+            span["seconds"] = round(time.perf_counter() - start, 4)
+            self._record(span)
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+        logger.info(json.dumps(
+            {"event": "stage", "job_id": self.job_id, "mode": self.mode, **span},
+            ensure_ascii=False, default=str,
+        ))
+        if self.metrics:
+            self.metrics.observe_stage(span["stage"], self.mode, span["outcome"], span["seconds"],
+                                       span.get("payload_bytes"))
+
+    def finish(self, outcome="ok", **attributes):
+        """Завершує задачу: пише підсумковий лог і метрику тривалості виконання"""
+        seconds = time.perf_counter() - self._start
+        self.attributes.update(attributes)
+        logger.info(json.dumps(
+            {"event": "job", "job_id": self.job_id, "mode": self.mode, "outcome": outcome,
+             "seconds": round(seconds, 4), "queued_seconds": round(self.queued_seconds, 4),
+             **self.attributes},
+            ensure_ascii=False, default=str,
+        ))
+        if self.metrics:
+            self.metrics.observe_job(self.mode, outcome, seconds)
+        return seconds
+
+    def breakdown(self):
+        """Етапи в порядку початку для панелі налагодження"""
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span["offset"])
+
+
+def maybe_stage(trace, name, **attributes):
+    """``trace.stage`` або порожній контекст, якщо задача не трасується"""
+    if trace is None:
+        return nullcontext(dict(attributes))
+    return trace.stage(name, **attributes)
+
+
+def configure_json_logging(level=logging.INFO):
+    """Виводить логи ``ltx.trace`` як є (кожен рядок — JSON обʼєкт)"""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+
+class MetricsServer:
+    """Локальний HTTP ендпоінт ``/metrics`` у фоновому потоці"""
+
+    def __init__(self, metrics, host="127.0.0.1", port=DEFAULT_METRICS_PORT):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
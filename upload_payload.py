@@ -0,0 +1,84 @@
+"""Підготовка зображення до відправки провайдерам.
+
+Зображення готується один раз на задачу: орієнтація з EXIF, приведення
+режиму до RGB (RGBA/P/L завантаження інакше ламають JPEG), зменшення до
+роздільності моделі зі збереженням пропорцій і одне JPEG кодування.
+Результат, base64 data URI та посилання на вже завантажені файли
+запамʼятовуються для всіх провайдерів і повторних спроб.
+"""
+
+import base64
+import io
+import threading
+from functools import cached_property
+
+from PIL import Image, ImageOps
+
+# LTX-Video генерує не більше 704 px по довшій і 512 px по коротшій стороні
+MODEL_LONG_EDGE = 704
+MODEL_SHORT_EDGE = 512
+SIZE_MULTIPLE = 32  # LTX-Video приймає лише сторони, кратні 32
+JPEG_QUALITY = 90
+DATA_URI_LIMIT = 256 * 1024  # більші файли краще завантажувати двійково
+
+
+def normalize_image(image):
+    """Повертає RGB копію з урахуванням EXIF орієнтації; прозорість — на білому"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P", "PA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def model_size(width, height, long_edge=MODEL_LONG_EDGE, short_edge=MODEL_SHORT_EDGE,
+               multiple=SIZE_MULTIPLE):
+    """Найбільший розмір, що вміщується в ліміти моделі, зі сторонами кратними ``multiple``
+
+    Пропорції зберігаються до округлення: 4000 × 3000 -> 683 × 512 -> 672 × 512.
+    """
+    scale = min(1.0, long_edge / max(width, height), short_edge / min(width, height))
+    return tuple(max(multiple, int(side * scale) // multiple * multiple) for side in (width, height))
+
+
+class UploadPayload:
+    """Закодоване один раз зображення для всіх провайдерів задачі"""
+
+    def __init__(self, image, long_edge=MODEL_LONG_EDGE, short_edge=MODEL_SHORT_EDGE,
+                 quality=JPEG_QUALITY):
+        image = normalize_image(image)
+        self.width, self.height = model_size(image.width, image.height, long_edge, short_edge)
+        if image.size != (self.width, self.height):
+            image = image.resize((self.width, self.height), Image.Resampling.LANCZOS)
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG", quality=quality)
+        self.jpeg = buffered.getvalue()
+        self._uploads = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @cached_property
+    def data_uri(self):
+        return f"data:image/jpeg;base64,{base64.b64encode(self.jpeg).decode()}"
+
+    @property
+    def prefers_binary(self):
+        """Чи варто завантажити файл двійково замість data URI"""
+        return len(self.jpeg) > DATA_URI_LIMIT
+
+    def upload(self, provider, upload_fn):
+        """Завантажує байти провайдеру один раз; повертає збережене посилання
+
+        ``upload_fn(jpeg_bytes)`` повертає URL файлу в провайдера. Повторні
+        спроби й інші запити того ж провайдера використовують цей URL.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(provider, threading.Lock())
+        with lock:
+            if provider not in self._uploads:
+                self._uploads[provider] = upload_fn(self.jpeg)
+            return self._uploads[provider]
@@ -0,0 +1,188 @@
+"""Локальне сховище готових відео провайдерів.
+
+Кожне відео завантажується з CDN провайдера один раз: потоком, частинами
+у тимчасовий файл (обірване зʼєднання продовжується запитом ``Range`` з
+місця обриву), потім перевіряється — розмір збігається з
+``Content-Length``, а вміст є контейнером MP4/MOV або WebM — і лише тоді
+атомарно стає файлом кешу. Далі інтерфейс і кнопка завантаження беруть
+файл з диска; Streamlit віддає його через свій ``/media`` ендпоінт, який
+відповідає на ``Range`` запити, тож перемотування не завантажує відео
+заново. Розмір каталогу обмежений, найдавніше переглянуті файли
+витісняються (LRU за часом доступу, як диск ``RenderCache``).
+
+URL відео приходить у відповіді провайдера (або вебхуку), тож сервер
+завантажує лише http(s) адреси з відомих CDN провайдерів, у тому числі
+після переадресацій, і не ходить за ними у внутрішню мережу.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+DEFAULT_STORE_DIR = os.path.join(tempfile.gettempdir(), "ltx_video_store")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+CHUNK_BYTES = 256 * 1024
+MAX_RESUMES = 3
+MAX_REDIRECTS = 3
+# CDN, з яких провайдери віддають готові відео (разом із піддоменами)
+ALLOWED_HOSTS = ("replicate.delivery", "fal.media", "segmind.com")
+
+
+class VideoStoreError(Exception):
+    """Відео не вдалося завантажити або воно не пройшло перевірку"""
+
+
+def check_url(url, allowed_hosts=ALLOWED_HOSTS):
+    """Піднімає ``VideoStoreError``, якщо URL не http(s) або не з відомого CDN"""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").rstrip(".").lower()
+    if parts.scheme not in ("http", "https"):
+        raise VideoStoreError(f"непідтримувана схема URL відео: {parts.scheme or url}")
+    if not any(host == allowed or host.endswith("." + allowed) for allowed in allowed_hosts):
+        raise VideoStoreError(f"відео з невідомого хосту: {host or url}")
+
+
+def looks_like_video(head):
+    """Чи схожі перші байти файлу на MP4/MOV (``ftyp``) або WebM (EBML)"""
+    return head[4:8] == b"ftyp" or head[:4] == b"\x1a\x45\xdf\xa3"
+
+
+class VideoStore:
+    """Кеш відео на диску з обмеженням розміру; один екземпляр на процес"""
+
+    def __init__(self, client, store_dir=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 allowed_hosts=ALLOWED_HOSTS):
+        self.client = client  # ProviderClient без облікових даних провайдерів
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.allowed_hosts = tuple(allowed_hosts)
+        self._lock = threading.Lock()
+        self._locks = {}  # шлях -> [замок, скільки викликів його тримають або чекають]
+        self.stats = {"hits": 0, "downloads": 0, "bytes_downloaded": 0, "resumes": 0, "evictions": 0}
+        os.makedirs(store_dir, exist_ok=True)
+
+    def path_for(self, url):
+        return os.path.join(self.store_dir, hashlib.sha256(url.encode()).hexdigest() + ".mp4")
+
+    def fetch(self, url):
+        """Шлях до локальної копії відео; завантажує його, якщо копії ще немає
+
+        Паралельні виклики з тим самим URL чекають на одне завантаження:
+        замок шляху живе, доки його тримає або чекає хоч один виклик, тож
+        пізній виклик не створить другого замка і другого завантаження.
+        """
+        check_url(url, self.allowed_hosts)
+        path = self.path_for(url)
+        with self._lock:
+            entry = self._locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if os.path.exists(path):
+                    os.utime(path)  # відмітка доступу для LRU
+                    with self._lock:
+                        self.stats["hits"] += 1
+                    return path
+                self._download(url, path)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[path]
+        with self._lock:
+            self.stats["downloads"] += 1
+        self._evict(keep=path)
+        return path
+
+    def _download(self, url, path):
+        fd, partial = tempfile.mkstemp(dir=self.store_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                expected = self._stream(url, f)
+            size = os.path.getsize(partial)
+            if expected is not None and size != expected:
+                raise VideoStoreError(f"отримано {size} байт замість {expected}")
+            with open(partial, "rb") as f:
+                if not looks_like_video(f.read(12)):
+                    raise VideoStoreError("завантажений файл не є відео")
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+    def _stream(self, url, f):
+        """Пише тіло відповіді у ``f``; повертає очікуваний повний розмір або None"""
+        received = 0
+        expected = None
+        for attempt in range(MAX_RESUMES + 1):
+            headers = {"Range": f"bytes={received}-"} if received else {}
+            try:
+                response = self._get(url, headers)
+            except requests.RequestException as e:
+                raise VideoStoreError(f"не вдалося завантажити відео: {e}") from e
+            with response:
+                if response.status_code not in (200, 206):
+                    raise VideoStoreError(f"CDN відповів {response.status_code}")
+                if received and response.status_code == 200:
+                    # Сервер не підтримує продовження — починаємо спочатку
+                    f.seek(0)
+                    f.truncate()
+                    received = 0
+                if response.status_code == 200:
+                    length = response.headers.get("Content-Length")
+                    expected = int(length) if length and length.isdigit() else None
+                try:
+                    for chunk in response.iter_content(CHUNK_BYTES):
+                        f.write(chunk)
+                        received += len(chunk)
+                        with self._lock:
+                            self.stats["bytes_downloaded"] += len(chunk)
+                except requests.RequestException as e:
+                    if attempt == MAX_RESUMES:
+                        raise VideoStoreError(f"завантаження обірвалось: {e}") from e
+                    with self._lock:
+                        self.stats["resumes"] += 1
+                    continue
+            return expected
+
+    def _get(self, url, headers):
+        """GET з переадресаціями, кожна з яких має вести на дозволений CDN"""
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self.client.get(url, headers=headers, stream=True, allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            response.close()
+            url = urljoin(url, response.headers["Location"])
+            check_url(url, self.allowed_hosts)
+        raise VideoStoreError("забагато переадресацій")
+
+    def _evict(self, keep):
+        files = []
+        total = 0
+        for name in os.listdir(self.store_dir):
+            if not name.endswith(".mp4"):
+                continue
+            path = os.path.join(self.store_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self.stats["evictions"] += 1